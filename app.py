@@ -1,24 +1,52 @@
-from flask import Flask, render_template, request, abort, flash, redirect, url_for, jsonify, session
+from flask import Flask, Response, render_template, stream_template, request, abort, flash, redirect, url_for, jsonify, session, g, send_from_directory
 import os
+import gzip
+import itertools
+import json
 import time
 import logging
 import traceback
 import uuid
 import shutil 
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
-from excel_diff.excel_parser import ExcelParser
+from excel_diff.excel_parser import ExcelParser, ExcelParserError, parse_range_specs
 from excel_diff.diff_engine import DiffEngine
 from excel_diff.git_reader import GitReader 
+from excel_diff.metrics import MetricsRegistry, RequestMetrics, SharedMetricsRegistry
+from excel_diff.profiling import PipelineProfiler, prune_profiles
+from excel_diff.session import CompareSession, SessionStore
+from excel_diff.cache import ParseCache, ResultStore
+from excel_diff.export import EXPORT_FORMATS, ExportError, stream_export
+from excel_diff.uploads import ChunkedUploadStore, UploadError
+from excel_diff.wire import ENCODING as COMPACT_ENCODING, CompactEncoder, decode_diff, gzip_stream
 
 app = Flask(__name__)
 
-# Security: Generate random secret key (not hardcoded)
+# Security: Generate random secret key (not hardcoded); worker processes of
+# serve.py share one through EXCEL_COMPARE_SECRET_KEY so sessions work on any worker
 import secrets
-app.secret_key = secrets.token_hex(32)
-
-# Storage for temporary comparison results
-comparison_results = {} 
+app.secret_key = os.environ.get("EXCEL_COMPARE_SECRET_KEY") or secrets.token_hex(32)
+
+# Storage for temporary comparison results: in memory for the desktop app, or a
+# folder shared by all worker processes (EXCEL_COMPARE_RESULT_STORE, set by serve.py)
+app.config["RESULT_STORE_FOLDER"] = os.environ.get("EXCEL_COMPARE_RESULT_STORE")
+comparison_results = ResultStore(app.config["RESULT_STORE_FOLDER"]) if app.config["RESULT_STORE_FOLDER"] else {}
+
+# Parsed sheets cached by content fingerprint, shared the same way (EXCEL_COMPARE_PARSE_CACHE)
+app.config["PARSE_CACHE_FOLDER"] = os.environ.get("EXCEL_COMPARE_PARSE_CACHE")
+parse_cache = ParseCache(app.config["PARSE_CACHE_FOLDER"]) if app.config["PARSE_CACHE_FOLDER"] else None
+
+# Re-compare sessions (commit vs. repeatedly uploaded local file), least recently used
+# dropped first once there are too many, they hold too many cells or sit idle too long.
+# They stay per process: a re-upload reaching another worker runs a full compare,
+# with the commit side usually served from the parse cache
+comparison_sessions = SessionStore(
+    max_sessions=20,
+    max_cells=int(os.environ.get("EXCEL_COMPARE_SESSION_CELLS", 5_000_000)),
+    idle_seconds=int(os.environ.get("EXCEL_COMPARE_SESSION_IDLE", 30 * 60)),
+)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if os.path.basename(current_dir).lower() == "internal":
@@ -27,8 +55,9 @@ else:
     PROJECT_ROOT = current_dir
 
 # --- LOGGING SETUP ---
+# Folders are created on the first request (see _prepare_runtime_folders) and the
+# log files are opened on first write, so importing the app touches no disk
 LOG_FOLDER = os.path.join(PROJECT_ROOT, "logs")
-os.makedirs(LOG_FOLDER, exist_ok=True)
 
 log_format = (
     "\n" + "#"*80 + "\n"
@@ -39,22 +68,413 @@ log_format = (
 )
 
 logging.basicConfig(
-    filename=os.path.join(LOG_FOLDER, 'app_error.log'),
+    handlers=[logging.FileHandler(os.path.join(LOG_FOLDER, 'app_error.log'), delay=True)],
     level=logging.ERROR,
     format=log_format
 )
 
+# Structured per-request metrics go to their own file, one JSON object per line
+metrics_logger = logging.getLogger("excel_compare.metrics")
+metrics_logger.setLevel(logging.INFO)
+metrics_logger.propagate = False
+_metrics_handler = logging.FileHandler(os.path.join(LOG_FOLDER, 'app_metrics.log'), delay=True)
+_metrics_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+metrics_logger.addHandler(_metrics_handler)
+
+# Worker processes of serve.py aggregate /metrics through a shared folder (EXCEL_COMPARE_METRICS_FOLDER)
+app.config["METRICS_FOLDER"] = os.environ.get("EXCEL_COMPARE_METRICS_FOLDER")
+metrics_registry = SharedMetricsRegistry(app.config["METRICS_FOLDER"]) if app.config["METRICS_FOLDER"] else MetricsRegistry()
+
+# --- PROFILING SETUP ---
+# Enabled for every request with EXCEL_COMPARE_PROFILE=1, or per request with
+# the "X-Profile: 1" header / "?profile=1" query flag unless
+# EXCEL_COMPARE_PROFILE_OPT_IN=0 (serve.py's default). Only the newest
+# EXCEL_COMPARE_PROFILE_KEEP profiles are kept on disk.
+PROFILE_FOLDER = os.path.join(PROJECT_ROOT, "profiles")
+app.config["PROFILING_ENABLED"] = os.environ.get("EXCEL_COMPARE_PROFILE") == "1"
+app.config["PROFILING_OPT_IN"] = os.environ.get("EXCEL_COMPARE_PROFILE_OPT_IN", "1") == "1"
+app.config["PROFILES_KEPT"] = int(os.environ.get("EXCEL_COMPARE_PROFILE_KEEP", 50))
+
+# --- WIRE FORMAT ---
+# Diff API responses use the compact encoding (excel_diff/wire.py) unless the
+# request asks for "encoding": "full" (JSON body or query string), or
+# EXCEL_COMPARE_WIRE_ENCODING=full switches the default back
+app.config["DIFF_WIRE_ENCODING"] = os.environ.get("EXCEL_COMPARE_WIRE_ENCODING", "compact")
+app.config["GZIP_RESPONSES"] = True
+GZIP_MIMETYPES = ("application/json", "application/x-ndjson", "text/html", "text/csv")
+GZIP_MIN_SIZE = 1024
+
 # --- UPLOAD SETUP ---
 BASE_UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, "uploads", "temp")
-os.makedirs(BASE_UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = os.path.abspath(BASE_UPLOAD_FOLDER)
 
 # SECURITY: Limit maximum upload size to 16MB
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# Larger workbooks go through the chunked upload API (/api/uploads) in pieces
+# of CHUNK_SIZE, spooled to disk and handed to a comparison by upload id
+app.config["CHUNKED_UPLOAD_FOLDER"] = os.path.abspath(os.path.join(PROJECT_ROOT, "uploads", "chunked"))
+app.config["CHUNKED_UPLOAD_MAX_SIZE"] = 512 * 1024 * 1024
+app.config["CHUNK_SIZE"] = 8 * 1024 * 1024
+upload_store = ChunkedUploadStore(app.config["CHUNKED_UPLOAD_FOLDER"], app.config["CHUNKED_UPLOAD_MAX_SIZE"])
+
 @app.errorhandler(413)
 def request_entity_too_large(error):
-    return "File is too large! Please upload a file smaller than 16MB.", 413
+    limit_mb = app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    message = (f"Request is too large (limit {limit_mb}MB). Larger workbooks are uploaded "
+               f"in chunks through /api/uploads, which the compare page does automatically.")
+    if request.path.startswith("/api/"):
+        return jsonify({"error": message}), 413
+    return f"File is too large! {message}", 413
+
+_runtime_folders_ready = False
+
+@app.before_request
+def _prepare_runtime_folders():
+    global _runtime_folders_ready
+    if not _runtime_folders_ready:
+        os.makedirs(LOG_FOLDER, exist_ok=True)
+        os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+        _runtime_folders_ready = True
+
+@app.before_request
+def _start_request_metrics():
+    g.metrics = RequestMetrics(request.endpoint)
+
+@app.after_request
+def _emit_request_metrics(response):
+    metrics = g.get("metrics")
+    if metrics is None or request.endpoint in (None, "static", "prometheus_metrics"):
+        return response
+    # Streamed bodies are still rendering here, so the header only covers the work done so far
+    # (usually fetch). Their full breakdown comes at the end of the body instead: "server_timing"
+    # in JSON summaries and window.serverTiming on result pages. Exports only log it (and /metrics)
+    response.headers["Server-Timing"] = metrics.server_timing()
+    if response.is_streamed:
+        response.call_on_close(lambda: _finish_request_metrics(metrics))
+    else:
+        _finish_request_metrics(metrics)
+    return response
+
+@app.after_request
+def _compress_response(response):
+    # Streamed bodies are gzipped chunk by chunk, so sheets still arrive as soon as they are diffed
+    if (not app.config["GZIP_RESPONSES"] or response.mimetype not in GZIP_MIMETYPES
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings.quality("gzip"):
+        return response
+    if response.is_streamed:
+        response.response = gzip_stream(response.response)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < GZIP_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@app.context_processor
+def _inject_server_timing():
+    # Called from the end of a streamed template, once every sheet has been parsed and diffed
+    metrics = g.get("metrics")
+    return {"server_timing": metrics.server_timing if metrics is not None else (lambda: "")}
+
+def _profiling_requested():
+    if app.config["PROFILING_ENABLED"]:
+        return True
+    return app.config["PROFILING_OPT_IN"] and (request.headers.get("X-Profile") == "1"
+                                               or request.args.get("profile") == "1")
+
+@app.before_request
+def _start_profiler():
+    if request.endpoint in (None, "static", "download_profile", "prometheus_metrics") or not _profiling_requested():
+        return
+    g.profiler = PipelineProfiler()
+    g.profiler.start()
+
+@app.after_request
+def _attach_profile(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    # Routes that store a result expose g.result_id so the profile sits next to it
+    profile_id = g.get("result_id") or str(uuid.uuid4())
+    response.headers["X-Profile-Id"] = profile_id
+    response.headers["X-Profile-Url"] = url_for("download_profile", profile_id=profile_id, kind="collapsed")
+
+    def finish():
+        profiler.stop()
+        try:
+            profiler.save(PROFILE_FOLDER, profile_id)
+            prune_profiles(PROFILE_FOLDER, app.config["PROFILES_KEPT"])
+        except Exception as e:
+            app.logger.error(f"PROFILE_SAVE_ERROR: {e}")
+
+    if response.is_streamed:
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+@app.teardown_request
+def _stop_abandoned_profiler(error):
+    # after_request is skipped for unhandled errors; never leave cProfile running
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+@app.route("/profiles/<profile_id>/<kind>", methods=["GET"])
+def download_profile(profile_id, kind):
+    """Download a stored profile as pstats or collapsed stacks (flamegraph.pl / speedscope input)."""
+    suffix = {"pstats": ".pstats", "collapsed": ".collapsed.txt"}.get(kind)
+    if suffix is None:
+        abort(404)
+    return send_from_directory(PROFILE_FOLDER, secure_filename(profile_id) + suffix, as_attachment=True)
+
+def _finish_request_metrics(metrics):
+    metrics_registry.record(metrics)
+    metrics_logger.info(json.dumps(metrics.as_dict()))
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Per-stage histograms in Prometheus text format."""
+    return Response(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+def _timed_fetch(fetch, *args, **kwargs):
+    """Runs a GitReader fetch under the 'fetch' stage and counts the bytes it wrote."""
+    with g.metrics.stage("fetch"):
+        file_path = fetch(*args, **kwargs)
+    g.metrics.add("bytes_fetched", os.path.getsize(file_path))
+    return file_path
+
+def _save_upload(file_storage, file_path):
+    with g.metrics.stage("fetch"):
+        file_storage.save(file_path)
+    g.metrics.add("bytes_fetched", os.path.getsize(file_path))
+    return file_path
+
+def _timed_stream(chunks, metrics):
+    """Attributes the time spent producing a streamed body to the 'render' stage."""
+    with metrics.stage("render"):
+        yield from chunks
+
+def _read_selection(data=None):
+    """Sheet list and A1 ranges limiting a comparison, as keyword arguments for ExcelParser.parse.
+
+    Form/query fields: sheets="Summary, Data" and range="A1:Z5000;Data!B2:F90".
+    JSON bodies: "sheets": [...] and "ranges": [...] (or one ";"-separated string).
+    Raises ExcelParserError for a malformed range.
+    """
+    if data is None:
+        sheets = request.values.get("sheets", "").split(",")
+        ranges = request.values.get("range", "").split(";")
+    else:
+        sheets = data.get("sheets") or []
+        ranges = data.get("ranges") or []
+        if isinstance(sheets, str):
+            sheets = sheets.split(",")
+        if isinstance(ranges, str):
+            ranges = ranges.split(";")
+    sheets = [name.strip() for name in sheets if name and name.strip()]
+    return {"sheets": sheets or None, "ranges": parse_range_specs(ranges)}
+
+def _claim_upload(upload_id, request_folder, prefix=""):
+    """Moves a finished chunked upload into the request folder; returns (path, original filename)."""
+    meta = upload_store.status(upload_id)
+    file_path = os.path.join(request_folder, prefix + secure_filename(meta["filename"]))
+    with g.metrics.stage("fetch"):
+        upload_store.claim(upload_id, file_path)
+    return file_path, meta["filename"]
+
+def _upload_error(e):
+    return jsonify({"error": str(e), "offset": e.offset}), e.status
+
+def _open_parser(file_path):
+    """ExcelParser for this request; _request_parsers() lists them so cleanup can close them."""
+    parser = ExcelParser(file_path, metrics=g.metrics, cache=parse_cache)
+    _request_parsers().append(parser)
+    return parser
+
+def _request_parsers():
+    return g.setdefault("parsers", [])
+
+def _cleanup_request_folder(request_folder, parsers=()):
+    if not request_folder:
+        return
+    # An .xls whose sheets were skipped (identical fingerprints) is still open,
+    # and on Windows an open file cannot be removed
+    for parser in parsers:
+        parser.close()
+    try:
+        if os.path.exists(request_folder):
+            shutil.rmtree(request_folder)
+    except Exception as e:
+        app.logger.error(f"Cleanup error for {request_folder}: {e}")
+
+def _friendly_error(e):
+    """Message shown to the user for a failed comparison; the details go to the error log."""
+    if isinstance(e, (ExcelParserError, UploadError)):
+        return str(e)
+    if isinstance(e, RequestEntityTooLarge):
+        return (f"File is too large! Files over {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB "
+                f"must be uploaded from the compare page, which sends them in chunks.")
+    if "git" in str(e).lower():
+        return "Could not access the Git repository. Please check your URL, Branch, and Path."
+    if "permission" in str(e).lower():
+        return "The system could not access the file. It might be open in another program."
+    return "An unexpected error occurred during comparison. Please verify your inputs."
+
+def _peek_diff(diff_iter):
+    """Diffs the first sheet before a streamed response is committed to.
+
+    Failures there (an unreadable workbook, usually) still reach the route's
+    own error handling and status code; returns an iterator over all sheets.
+    """
+    diff_iter = iter(diff_iter)
+    try:
+        first = next(diff_iter)
+    except StopIteration:
+        return iter(())
+    return itertools.chain((first,), diff_iter)
+
+def _guarded_diff(diff_iter, tag):
+    """Turns a sheet failing after the headers were sent into a final {"stream_error": message} item."""
+    try:
+        yield from diff_iter
+    except Exception as e:
+        app.logger.error(f"{tag}: {e}\n{traceback.format_exc()}")
+        yield {"stream_error": _friendly_error(e)}
+
+def _logged_diff(diff_iter, tag):
+    """Logs a sheet failing after the headers were sent and re-raises, so the streamed body ends broken."""
+    try:
+        yield from diff_iter
+    except Exception as e:
+        app.logger.error(f"{tag}: {e}\n{traceback.format_exc()}")
+        raise
+
+def _stream_result_page(diff_iter, request_folder, **context):
+    """Streams the result page sheet by sheet; the temp folder is removed once the response is closed.
+
+    The first sheet is diffed up front, so its errors propagate to the caller.
+    A later failure ends the page with an error block instead of the totals.
+    """
+    response = Response(_timed_stream(stream_template(
+        "excel_diff_result.html",
+        diff=_guarded_diff(_peek_diff(diff_iter), "STREAM_RENDER_ERROR"),
+        **context
+    ), g.metrics))
+    parsers = _request_parsers()
+    response.call_on_close(lambda: _cleanup_request_folder(request_folder, parsers))
+    return response
+
+def _wants_ndjson():
+    return (request.args.get("format") == "ndjson"
+            or request.accept_mimetypes.best == "application/x-ndjson")
+
+def _wants_compact(data=None):
+    encoding = (data or {}).get("encoding") or request.args.get("encoding") or app.config["DIFF_WIRE_ENCODING"]
+    return encoding != "full"
+
+def _stream_json_diff(diff_iter, request_folder, extra, ndjson=False, compact=False):
+    """Streams a diff as one JSON document (or NDJSON lines), emitting each sheet as soon as it is diffed.
+
+    With compact=True sheets use the wire encoding from excel_diff/wire.py and
+    the summary (and every NDJSON sheet line) carries "encoding": "compact-v1".
+
+    The first sheet is diffed before the response starts, so an early failure
+    raises here and the route answers with its usual error status. Once the
+    200 is sent, a failing sheet ends the diff and the summary gets an
+    "error" field: clients must treat a summary with "error" as an
+    incomplete diff, whatever the status code. The summary's "server_timing"
+    holds the per-stage timings the Server-Timing header cannot.
+    """
+    diff_iter = _peek_diff(diff_iter)
+    metrics = g.metrics  # generate() runs after the request context is gone
+    encoder = CompactEncoder() if compact else None
+    dumps = json.dumps if not compact else lambda obj: json.dumps(obj, separators=(",", ":"))
+
+    def generate():
+        total_row_changes = 0
+        if not ndjson:
+            yield '{"diff": ['
+        error = None
+        try:
+            for i, sheet in enumerate(diff_iter):
+                total_row_changes += DiffEngine.count_row_changes(sheet)
+                if encoder is not None:
+                    sheet = encoder.encode_sheet(sheet)
+                if ndjson:
+                    line = {"type": "sheet", "sheet": sheet}
+                    if compact:
+                        line["encoding"] = COMPACT_ENCODING
+                    yield dumps(line) + "\n"
+                else:
+                    yield ("," if i else "") + dumps(sheet)
+        except Exception as e:
+            app.logger.error(f"STREAM_JSON_ERROR: {e}\n{traceback.format_exc()}")
+            error = str(e)
+        summary = dict(extra, total_diffs=total_row_changes, server_timing=metrics.server_timing())
+        if compact:
+            summary["encoding"] = COMPACT_ENCODING
+        if error:
+            summary["error"] = error
+        if ndjson:
+            yield json.dumps(dict(summary, type="summary")) + "\n"
+        else:
+            yield "], " + json.dumps(summary)[1:]
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    response = Response(_timed_stream(generate(), g.metrics), mimetype=mimetype)
+    parsers = _request_parsers()
+    response.call_on_close(lambda: _cleanup_request_folder(request_folder, parsers))
+    return response
+
+@app.route("/api/uploads", methods=["POST"])
+def create_upload():
+    """Starts a chunked upload: {"filename", "size", "sha256" (optional)} -> upload id and chunk size."""
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = str(data.get("filename", "")).strip()
+        if not filename.lower().endswith((".xlsx", ".xls")):
+            return jsonify({"error": "Uploaded file must be .xlsx or .xls format"}), 400
+        state = upload_store.create(filename, data.get("size"), data.get("sha256"))
+        return jsonify(dict(state, chunk_size=app.config["CHUNK_SIZE"])), 201
+    except UploadError as e:
+        return _upload_error(e)
+    except Exception as e:
+        app.logger.error(f"UPLOAD_CREATE_ERROR: {e}\n{traceback.format_exc()}")
+        return jsonify({"error": "Could not start upload"}), 500
+
+@app.route("/api/uploads/<upload_id>", methods=["GET", "PUT", "DELETE"])
+def upload_chunk(upload_id):
+    """GET: resume offset. PUT ?offset=N: append the raw request body (X-Chunk-Sha256 optional). DELETE: abort."""
+    try:
+        if request.method == "GET":
+            return jsonify(upload_store.status(upload_id)), 200
+        if request.method == "DELETE":
+            upload_store.discard(upload_id)
+            return jsonify({"success": True}), 200
+
+        try:
+            offset = int(request.args.get("offset", ""))
+        except ValueError:
+            return jsonify({"error": "Missing or invalid offset"}), 400
+        with g.metrics.stage("fetch"):
+            state = upload_store.write_chunk(upload_id, offset, request.stream, request.headers.get("X-Chunk-Sha256"))
+        g.metrics.add("bytes_fetched", state["offset"] - offset)
+        return jsonify(state), 200
+    except UploadError as e:
+        return _upload_error(e)
+    except RequestEntityTooLarge:
+        raise  # Chunk bigger than MAX_CONTENT_LENGTH: the 413 handler answers
+    except Exception as e:
+        app.logger.error(f"UPLOAD_CHUNK_ERROR: {e}\n{traceback.format_exc()}")
+        return jsonify({"error": "Chunk upload failed"}), 500
 
 @app.route("/", methods=["GET", "POST"])
 def excel_diff():
@@ -72,9 +492,12 @@ def excel_diff():
     try:
         source_a = request.form.get("source_a", "pc")
         source_b = request.form.get("source_b", "pc")
+        selection = _read_selection()
 
         # Resolve Excel A
-        if source_a == "pc":
+        if source_a == "pc" and request.form.get("upload_id_a"):
+            excel_a_path, display_name_a = _claim_upload(request.form["upload_id_a"], request_folder, "a_")
+        elif source_a == "pc":
             file_a = request.files.get("file_a")
             if not file_a or file_a.filename == "":
                 flash("Excel A file missing", "error")
@@ -83,14 +506,15 @@ def excel_diff():
             display_name_a = file_a.filename
             filename = secure_filename(file_a.filename)
             excel_a_path = os.path.join(request_folder, f"a_{filename}")
-            file_a.save(excel_a_path)
+            _save_upload(file_a, excel_a_path)
         else:  
             branch_a = request.form.get("branch_a", "N/A")
             path_a = request.form.get("path_a", "")
             git_filename_a = os.path.basename(path_a)
             display_name_a = f"[Git: {branch_a}] {git_filename_a}"
             
-            excel_a_path = GitReader.fetch_excel(
+            excel_a_path = _timed_fetch(
+                GitReader.fetch_excel,
                 branch=branch_a,
                 path=path_a,
                 url=request.form.get("url_a"), 
@@ -98,7 +522,9 @@ def excel_diff():
             )
 
         # Resolve Excel B
-        if source_b == "pc":
+        if source_b == "pc" and request.form.get("upload_id_b"):
+            excel_b_path, display_name_b = _claim_upload(request.form["upload_id_b"], request_folder, "b_")
+        elif source_b == "pc":
             file_b = request.files.get("file_b")
             if not file_b or file_b.filename == "":
                 flash("Excel B file missing", "error")
@@ -107,14 +533,15 @@ def excel_diff():
             display_name_b = file_b.filename
             filename = secure_filename(file_b.filename)
             excel_b_path = os.path.join(request_folder, f"b_{filename}")
-            file_b.save(excel_b_path)
+            _save_upload(file_b, excel_b_path)
         else:  
             branch_b = request.form.get("branch_b", "N/A")
             path_b = request.form.get("path_b", "")
             git_filename_b = os.path.basename(path_b)
             display_name_b = f"[Git: {branch_b}] {git_filename_b}"
             
-            excel_b_path = GitReader.fetch_excel(
+            excel_b_path = _timed_fetch(
+                GitReader.fetch_excel,
                 branch=branch_b,
                 path=path_b,
                 url=request.form.get("url_b"),
@@ -122,22 +549,13 @@ def excel_diff():
             )
 
         # Parse Excel files (Handles .xls and .xlsx via your updated parser)
-        parser_a = ExcelParser(excel_a_path)
-        parser_b = ExcelParser(excel_b_path)
-        data_a = parser_a.parse()
-        data_b = parser_b.parse()
-
-        # Diff Engine Logic
-        diff_engine = DiffEngine(data_a, data_b)
-        diff_result = diff_engine.compare()
+        parser_a = _open_parser(excel_a_path)
+        parser_b = _open_parser(excel_b_path)
+        data_a = parser_a.parse(**selection)
+        data_b = parser_b.parse(**selection)
 
-        # Calculate total row-based changes
-        total_row_changes = 0
-        for sheet in diff_result:
-            if sheet.get('data') and 'rows' in sheet['data']:
-                for row in sheet['data']['rows']:
-                    if any(cell.get('status') != 'equal' and (cell.get('a') or cell.get('b')) for cell in row.get('cells', [])):
-                        total_row_changes += 1
+        # Diff Engine Logic: sheets are parsed and diffed while the page streams
+        diff_engine = DiffEngine(data_a, data_b, metrics=g.metrics)
 
         # Prepare commit history metadata (ensure no None values)
         commit_metadata = {
@@ -147,35 +565,25 @@ def excel_diff():
             'url_a': request.form.get("url_a", "") or "",
         }
 
-        return render_template(
-            "excel_diff_result.html",
-            diff=diff_result,
-            total_diffs=total_row_changes,
+        response = _stream_result_page(
+            diff_engine.iter_compare(),
+            request_folder,
             excel_a_name=display_name_a,
             excel_b_name=display_name_b,
             commit_metadata=commit_metadata,
         )
+        request_folder = None  # Cleanup now belongs to the streamed response
+        return response
 
     except Exception as e:
         error_info = traceback.format_exc()
         app.logger.error(f"DIFF_ERROR: {str(e)}\n{error_info}")
         
-        if "git" in str(e).lower():
-            friendly_msg = "Could not access the Git repository. Please check your URL, Branch, and Path."
-        elif "permission" in str(e).lower():
-            friendly_msg = "The system could not access the file. It might be open in another program."
-        else:
-            friendly_msg = "An unexpected error occurred during comparison. Please verify your inputs."
-            
-        flash(friendly_msg, "error")
+        flash(_friendly_error(e), "error")
         return redirect(url_for('excel_diff'))
 
     finally:
-        try:
-            if request_folder and os.path.exists(request_folder):
-                shutil.rmtree(request_folder)
-        except Exception as e:
-            app.logger.error(f"Cleanup error for {request_folder}: {e}")
+        _cleanup_request_folder(request_folder, _request_parsers())
 
 @app.route("/api/commit-history", methods=["POST"])
 def get_commit_history():
@@ -212,7 +620,12 @@ def get_commit_history():
 
 @app.route("/api/compare-with-commit", methods=["POST"])
 def compare_with_commit():
-    """API endpoint to compare two commits from Git history."""
+    """API endpoint to compare two commits from Git history.
+
+    Answers {"diff": [...], "commit_info", "total_diffs"} (or NDJSON sheet lines
+    and a summary line). A sheet failing after the response started is reported
+    in-band: the diff is cut short and the summary carries "error".
+    """
     try:
         data = request.get_json()
         commit_hash_a = data.get("commit_hash_a")
@@ -223,6 +636,11 @@ def compare_with_commit():
         
         if not commit_hash_a or not commit_hash_b or not path:
             return jsonify({"error": "Missing required parameters"}), 400
+
+        try:
+            selection = _read_selection(data)
+        except ExcelParserError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Create temp directory for fetching commit versions
         request_id = str(uuid.uuid4())
@@ -231,42 +649,37 @@ def compare_with_commit():
         
         try:
             # Fetch both commit versions
-            excel_a_path = GitReader.fetch_excel_by_commit(commit_hash_a, path, request_folder, url)
-            excel_b_path = GitReader.fetch_excel_by_commit(commit_hash_b, path, request_folder, url)
+            excel_a_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_hash_a, path, request_folder, url)
+            excel_b_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_hash_b, path, request_folder, url)
             
             # Parse and compare
-            parser_a = ExcelParser(excel_a_path)
-            parser_b = ExcelParser(excel_b_path)
-            data_a = parser_a.parse()
-            data_b = parser_b.parse()
+            parser_a = _open_parser(excel_a_path)
+            parser_b = _open_parser(excel_b_path)
+            data_a = parser_a.parse(**selection)
+            data_b = parser_b.parse(**selection)
             
-            diff_engine = DiffEngine(data_a, data_b)
-            diff_result = diff_engine.compare()
+            diff_engine = DiffEngine(data_a, data_b, metrics=g.metrics)
             
-            # Calculate total changes
-            total_row_changes = 0
-            for sheet in diff_result:
-                if sheet.get('data') and 'rows' in sheet['data']:
-                    for row in sheet['data']['rows']:
-                        if any(cell.get('status') != 'equal' and (cell.get('a') or cell.get('b')) for cell in row.get('cells', [])):
-                            total_row_changes += 1
-            
-            return jsonify({
-                "diff": diff_result,
-                "total_diffs": total_row_changes,
-                "commit_info": {
-                    "hash_a": commit_hash_a[:7],
-                    "hash_b": commit_hash_b[:7],
-                    "branch": branch
-                }
-            })
+            response = _stream_json_diff(
+                diff_engine.iter_compare(),
+                request_folder,
+                {
+                    "commit_info": {
+                        "hash_a": commit_hash_a[:7],
+                        "hash_b": commit_hash_b[:7],
+                        "branch": branch
+                    }
+                },
+                ndjson=_wants_ndjson(),
+                compact=_wants_compact(data)
+            )
+            request_folder = None  # Cleanup now belongs to the streamed response
+            return response
         finally:
-            try:
-                if request_folder and os.path.exists(request_folder):
-                    shutil.rmtree(request_folder)
-            except Exception as e:
-                app.logger.error(f"Cleanup error: {e}")
+            _cleanup_request_folder(request_folder, _request_parsers())
     
+    except ExcelParserError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         app.logger.error(f"COMPARE_COMMIT_ERROR: {str(e)}\n{traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
@@ -296,30 +709,27 @@ def compare_commits_page():
             flash('Invalid file path: only .xlsx and .xls files are supported. Please provide the full file path including extension.', 'error')
             return redirect(url_for('excel_diff'))
 
+        try:
+            selection = _read_selection()
+        except ExcelParserError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('excel_diff'))
+
         # Create temp dir
         request_id = str(uuid.uuid4())
         request_folder = os.path.join(app.config['UPLOAD_FOLDER'], request_id)
         os.makedirs(request_folder, exist_ok=True)
 
         try:
-            excel_a_path = GitReader.fetch_excel_by_commit(commit_a, path, request_folder, url)
-            excel_b_path = GitReader.fetch_excel_by_commit(commit_b, path, request_folder, url)
+            excel_a_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_a, path, request_folder, url)
+            excel_b_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_b, path, request_folder, url)
 
-            parser_a = ExcelParser(excel_a_path)
-            parser_b = ExcelParser(excel_b_path)
-            data_a = parser_a.parse()
-            data_b = parser_b.parse()
+            parser_a = _open_parser(excel_a_path)
+            parser_b = _open_parser(excel_b_path)
+            data_a = parser_a.parse(**selection)
+            data_b = parser_b.parse(**selection)
 
-            diff_engine = DiffEngine(data_a, data_b)
-            diff_result = diff_engine.compare()
-
-            # Calculate total row-based changes
-            total_row_changes = 0
-            for sheet in diff_result:
-                if sheet.get('data') and 'rows' in sheet['data']:
-                    for row in sheet['data']['rows']:
-                        if any(cell.get('status') != 'equal' and (cell.get('a') or cell.get('b')) for cell in row.get('cells', [])):
-                            total_row_changes += 1
+            diff_engine = DiffEngine(data_a, data_b, metrics=g.metrics)
 
             # Ensure no None values in metadata
             commit_metadata = {
@@ -330,21 +740,21 @@ def compare_commits_page():
                 'path_b': path_b or '',
                 'url_b': url_b or ''
             }
-            return render_template(
-                'excel_diff_result.html',
-                diff=diff_result,
-                total_diffs=total_row_changes,
+            response = _stream_result_page(
+                diff_engine.iter_compare(),
+                request_folder,
                 excel_a_name=f'[Commit: {commit_a[:7]}]',
                 excel_b_name=f'[Commit: {commit_b[:7]}]',
                 commit_metadata=commit_metadata
             )
+            request_folder = None  # Cleanup now belongs to the streamed response
+            return response
         finally:
-            try:
-                if request_folder and os.path.exists(request_folder):
-                    shutil.rmtree(request_folder)
-            except Exception as e:
-                app.logger.error(f'Cleanup error: {e}')
+            _cleanup_request_folder(request_folder, _request_parsers())
 
+    except ExcelParserError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('excel_diff'))
     except Exception as e:
         app.logger.error(f'COMPARE_PAGE_ERROR: {e}\n{traceback.format_exc()}')
         flash('Error generating commit comparison. Check parameters and try again.', 'error')
@@ -366,6 +776,7 @@ def compare_commit_local_unified():
         url = request.form.get('url', '').strip() or None
         hash_side = request.form.get('hash_side', 'a').strip()  # 'a' or 'b'
         local_file = request.files.get('local_file')
+        local_upload_id = request.form.get('local_upload_id', '').strip()  # Large files: chunked upload id instead
         # Get File B metadata
         branch_b = request.form.get('branch_b', '').strip()
         path_b = request.form.get('path_b', '').strip()
@@ -373,7 +784,7 @@ def compare_commit_local_unified():
         upload_file_b_name = request.form.get('upload_file_b_name', '').strip()
 
         # Validation
-        if not hash_val or not local_file:
+        if not hash_val or not (local_file or local_upload_id):
             return jsonify({"error": "Missing commit hash or local file"}), 400
         
         # Length validation
@@ -382,72 +793,89 @@ def compare_commit_local_unified():
         if len(branch) > MAX_BRANCH_LEN or (url and len(url) > MAX_URL_LEN):
             return jsonify({"error": "Input parameters too long"}), 400
 
-        if not local_file.filename.lower().endswith(('.xlsx', '.xls')):
+        if local_file and not local_file.filename.lower().endswith(('.xlsx', '.xls')):
             return jsonify({"error": "Uploaded file must be .xlsx or .xls format"}), 400
 
+        try:
+            selection = _read_selection()
+        except ExcelParserError as e:
+            return jsonify({"error": str(e)}), 400
+
+        session_id = request.form.get('session_id', '').strip()
+        session_key = (hash_val, path, url, hash_side, repr(selection))
+        compare_session = comparison_sessions.get(session_id)
+        if compare_session is not None and (compare_session.key != session_key
+                                            or compare_session.result_id not in comparison_results):
+            compare_session = None
+
         # Create temp directory
         request_id = str(uuid.uuid4())
         request_folder = os.path.join(app.config['UPLOAD_FOLDER'], request_id)
         os.makedirs(request_folder, exist_ok=True)
 
         try:
-            # Fetch commit file and save local file
-            commit_file_path = GitReader.fetch_excel_by_commit(hash_val, path, request_folder, url)
-            local_file_path = os.path.join(request_folder, secure_filename(local_file.filename))
-            local_file.save(local_file_path)
-
-            # Parse both files
-            parser_commit = ExcelParser(commit_file_path)
-            parser_local = ExcelParser(local_file_path)
-            data_commit = parser_commit.parse()
-            data_local = parser_local.parse()
-
-            # Run diff - commit on side A, local on side B (unless hash_side is 'b')
+            # Save local file; the commit side is only fetched and parsed when no session has it yet
+            if local_upload_id:
+                local_file_path, local_name = _claim_upload(local_upload_id, request_folder)
+            else:
+                local_name = local_file.filename
+                local_file_path = os.path.join(request_folder, secure_filename(local_name))
+                _save_upload(local_file, local_file_path)
+            data_local = _open_parser(local_file_path).parse(**selection)
+
+            if compare_session is None:
+                commit_file_path = _timed_fetch(GitReader.fetch_excel_by_commit, hash_val, path, request_folder, url)
+                data_commit = _open_parser(commit_file_path).parse(**selection)
+                compare_session = CompareSession(session_key, data_commit, commit_side=hash_side)
+                session_id = comparison_sessions.add(compare_session)
+
+            # Commit on side A, local on side B (unless hash_side is 'b')
             if hash_side == 'a':
-                diff_engine = DiffEngine(data_commit, data_local)
                 excel_a_name = f'[Commit: {hash_val[:7]}]'
-                excel_b_name = f'[Local: {local_file.filename}]'
+                excel_b_name = f'[Local: {local_name}]'
             else:
-                diff_engine = DiffEngine(data_local, data_commit)
-                excel_a_name = f'[Local: {local_file.filename}]'
+                excel_a_name = f'[Local: {local_name}]'
                 excel_b_name = f'[Commit: {hash_val[:7]}]'
 
-            diff_result = diff_engine.compare()
-
-            # Calculate total changes
-            total_row_changes = 0
-            for sheet in diff_result:
-                if sheet.get('data') and 'rows' in sheet['data']:
-                    for row in sheet['data']['rows']:
-                        if any(cell.get('status') != 'equal' and (cell.get('a') or cell.get('b')) for cell in row.get('cells', [])):
-                            total_row_changes += 1
-
-            # Store result and return a redirect URL
-            result_id = str(uuid.uuid4())
-            comparison_results[result_id] = {
-                "diff": diff_result,
-                "total_diffs": total_row_changes,
-                "excel_a_name": excel_a_name,
-                "excel_b_name": excel_b_name,
-                "commit_metadata": {'branch_a': branch, 'path_a': path, 'url_a': url, 'branch_b': branch_b, 'path_b': path_b, 'url_b': url_b}
-            }
-            
+            with compare_session.lock:
+                diff_result = compare_session.compare(data_local, metrics=g.metrics)
+                total_row_changes = sum(DiffEngine.count_row_changes(sheet) for sheet in diff_result)
+
+                # Store result (patched in place on re-compares) and return a redirect URL
+                if compare_session.result_id is None:
+                    compare_session.result_id = str(uuid.uuid4())
+                result_id = g.result_id = compare_session.result_id
+                comparison_results[result_id] = {
+                    "diff": diff_result,
+                    "total_diffs": total_row_changes,
+                    "excel_a_name": excel_a_name,
+                    "excel_b_name": excel_b_name,
+                    "commit_metadata": {'branch_a': branch, 'path_a': path, 'url_a': url, 'branch_b': branch_b, 'path_b': path_b, 'url_b': url_b}
+                }
+                comparison_sessions.update(session_id)  # Sized now that it holds a diff
+
             return jsonify({
                 "success": True,
+                "session_id": session_id,
                 "redirect_url": f"/view-result/{result_id}"
             }), 200
 
+        except UploadError as e:
+            return _upload_error(e)
+
+        except ExcelParserError as e:
+            return jsonify({"error": str(e)}), 400
+
         except Exception as e:
             app.logger.error(f'Unified compare error: {e}\n{traceback.format_exc()}')
             return jsonify({"error": "Comparison failed"}), 500
 
         finally:
             # Cleanup temp folder
-            try:
-                shutil.rmtree(request_folder)
-            except:
-                pass
+            _cleanup_request_folder(request_folder, _request_parsers())
 
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         app.logger.error(f'API_COMPARE_UNIFIED_ERROR: {e}\n{traceback.format_exc()}')
         return jsonify({"error": "Server error"}), 500
@@ -464,32 +892,119 @@ def view_comparison_result(result_id):
         # Clean up after viewing (optional - comment out if you want to keep results longer)
         # del comparison_results[result_id]
         
-        return render_template(
+        return Response(_timed_stream(stream_template(
             'excel_diff_result.html',
             diff=result.get('diff', []),
             total_diffs=result.get('total_diffs', 0),
             excel_a_name=result.get('excel_a_name', 'File A'),
             excel_b_name=result.get('excel_b_name', 'File B'),
-            commit_metadata=result.get('commit_metadata', {})
-        )
+            commit_metadata=result.get('commit_metadata', {}),
+            result_id=result_id
+        ), g.metrics))
     except Exception as e:
         app.logger.error(f'VIEW_RESULT_ERROR: {e}\n{traceback.format_exc()}')
         flash('Error loading comparison result.', 'error')
         return redirect(url_for('excel_diff'))
 
+def _export_response(diff, fmt, download_name, request_folder=None):
+    """Streams a diff as an XLSX/CSV/Parquet download; raises ExportError for unknown or unavailable formats.
+
+    Stage timings of an export are only in the metrics log and /metrics: the body has no room for them.
+    """
+    chunks = stream_export(diff, fmt, changed_only=request.values.get("changed_only", "1") != "0")
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    response = Response(_timed_stream(chunks, g.metrics), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{download_name}{extension}"'
+    parsers = _request_parsers()
+    response.call_on_close(lambda: _cleanup_request_folder(request_folder, parsers))
+    return response
+
+@app.route('/export/<result_id>/<fmt>', methods=['GET'])
+def export_result(result_id, fmt):
+    """Download a stored comparison result as a highlighted XLSX, a changed-cells CSV or Parquet."""
+    try:
+        result = comparison_results.get(result_id)
+        if result is None:
+            return jsonify({"error": "Comparison result not found or expired"}), 404
+        return _export_response(result.get('diff', []), fmt, f"diff_{secure_filename(result_id)[:8]}")
+    except ExportError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        app.logger.error(f'EXPORT_RESULT_ERROR: {e}\n{traceback.format_exc()}')
+        return jsonify({"error": "Export failed"}), 500
+
+@app.route("/api/export", methods=["POST"])
+def export_commit_diff():
+    """Compare two commits (same body as /api/compare-with-commit plus "format") and stream the export.
+
+    The diff is written out sheet by sheet as DiffEngine produces it and is never held whole.
+    A sheet failing after the download started aborts the transfer (see stream_export).
+    """
+    try:
+        data = request.get_json() or {}
+        commit_hash_a = data.get("commit_hash_a")
+        commit_hash_b = data.get("commit_hash_b")
+        path = data.get("path", "")
+        url = data.get("url")
+        fmt = data.get("format", "xlsx")
+
+        if not commit_hash_a or not commit_hash_b or not path:
+            return jsonify({"error": "Missing required parameters"}), 400
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unknown export format '{fmt}'"}), 400
+
+        try:
+            selection = _read_selection(data)
+        except ExcelParserError as e:
+            return jsonify({"error": str(e)}), 400
+
+        request_id = str(uuid.uuid4())
+        request_folder = os.path.join(app.config["UPLOAD_FOLDER"], request_id)
+        os.makedirs(request_folder, exist_ok=True)
+
+        try:
+            excel_a_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_hash_a, path, request_folder, url)
+            excel_b_path = _timed_fetch(GitReader.fetch_excel_by_commit, commit_hash_b, path, request_folder, url)
+            data_a = _open_parser(excel_a_path).parse(**selection)
+            data_b = _open_parser(excel_b_path).parse(**selection)
+            # Unchanged sheets are exported with their cells, so nothing is skipped here
+            diff_engine = DiffEngine(data_a, data_b, metrics=g.metrics, skip_identical=False)
+
+            download_name = f"diff_{secure_filename(commit_hash_a[:7])}_{secure_filename(commit_hash_b[:7])}"
+            # A failing first sheet still answers with an error status; a later one breaks the download
+            response = _export_response(
+                _logged_diff(_peek_diff(diff_engine.iter_compare()), "STREAM_EXPORT_ERROR"),
+                fmt, download_name, request_folder
+            )
+            request_folder = None  # Cleanup now belongs to the streamed response
+            return response
+        finally:
+            _cleanup_request_folder(request_folder, _request_parsers())
+
+    except ExportError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ExcelParserError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"EXPORT_COMMIT_ERROR: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/comparison-result', methods=['POST'])
 def comparison_result_page():
     """Render a full comparison page from JSON data."""
     try:
         data = request.get_json()
-        return render_template(
+        diff = data.get('diff', [])
+        if data.get('encoding') == COMPACT_ENCODING:
+            diff = decode_diff(diff)
+        return Response(_timed_stream(stream_template(
             'excel_diff_result.html',
-            diff=data.get('diff', []),
+            diff=diff,
             total_diffs=data.get('total_diffs', 0),
             excel_a_name=data.get('excel_a_name', 'File A'),
             excel_b_name=data.get('excel_b_name', 'File B'),
             commit_metadata=data.get('commit_metadata', {})
-        )
+        ), g.metrics))
     except Exception as e:
         app.logger.error(f'COMPARISON_RESULT_ERROR: {e}\n{traceback.format_exc()}')
         return jsonify({"error": "Failed to render comparison result"}), 500
@@ -0,0 +1,148 @@
+"""Concurrent load test for serve.py.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --server gunicorn --workers 4 --threads 2 --concurrency 8
+    python -m benchmarks.load_test --server dev --concurrency 8       # single-process baseline
+
+Each comparison uploads version B of a generated workbook against the commit
+holding version A in a throwaway repository (/api/compare-commit-local-unified),
+then opens the stored result page, which may be served by another worker.
+Reports throughput and latency percentiles over --requests comparisons.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.run_benchmarks import _make_repo
+from benchmarks.workbook_gen import SCALES, generate_pair
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for_server(port, proc, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with status {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+def _multipart(fields: dict, files: dict):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def _compare_once(base_url, fields, files):
+    """One comparison plus the result page view; returns seconds taken."""
+    start = time.perf_counter()
+    body, content_type = _multipart(fields, files)
+    request = urllib.request.Request(f"{base_url}/api/compare-commit-local-unified", data=body,
+                                     headers={"Content-Type": content_type})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        result = json.loads(response.read())
+    with urllib.request.urlopen(base_url + result["redirect_url"], timeout=600) as response:
+        page = response.read()
+    if b'id="stat-changes"' not in page:
+        raise RuntimeError("Result not found (redirected to the upload page)")
+    return time.perf_counter() - start
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test concurrent comparisons against serve.py.")
+    parser.add_argument("--server", default="auto", help="serve.py --server value (auto, gunicorn, waitress, dev)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--rows", type=int)
+    parser.add_argument("--format", default=".xlsx")
+    args = parser.parse_args(argv)
+
+    spec = SCALES[args.scale] if args.rows is None else dataclasses.replace(SCALES[args.scale], rows=args.rows)
+    work_dir = tempfile.mkdtemp(prefix="excel_load_")
+    proc = None
+    try:
+        path_a, path_b = generate_pair(work_dir, spec, args.format)
+        repo, target, (hash_a, _) = _make_repo(work_dir, path_a, path_b, args.format)
+        with open(path_b, "rb") as f:
+            local_bytes = f.read()
+        fields = {"hash": hash_a, "path": target, "hash_side": "a"}
+        files = {"local_file": (os.path.basename(path_b), local_bytes)}
+
+        port = _free_port()
+        log_path = os.path.join(work_dir, "server.log")
+        with open(log_path, "wb") as log:
+            # GitReader reads local repositories from the working directory
+            proc = subprocess.Popen(
+                [sys.executable, os.path.join(PROJECT_ROOT, "serve.py"), "--server", args.server,
+                 "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers),
+                 "--threads", str(args.threads), "--state-folder", os.path.join(work_dir, "state")],
+                cwd=repo, stdout=log, stderr=subprocess.STDOUT)
+        _wait_for_server(port, proc)
+        base_url = f"http://127.0.0.1:{port}"
+        _compare_once(base_url, fields, files)  # warm-up
+
+        print(f"[*] {args.requests} comparisons, concurrency {args.concurrency}, server {args.server} "
+              f"({args.workers} workers x {args.threads} threads), spec {spec}")
+        latencies, errors = [], []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(_compare_once, base_url, fields, files) for _ in range(args.requests)]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+        wall = time.perf_counter() - start
+
+        if latencies:
+            print(f"throughput {len(latencies) / wall:8.2f} comparisons/s   wall {wall:.2f}s")
+            print(f"latency    p50 {statistics.median(latencies) * 1000:8.1f} ms   "
+                  f"p95 {_percentile(latencies, 0.95) * 1000:8.1f} ms   max {max(latencies) * 1000:8.1f} ms")
+        for message in errors[:5]:
+            print(f"[!] {message}")
+        print(f"errors     {len(errors)}")
+        return 1 if errors else 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
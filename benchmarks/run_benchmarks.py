@@ -0,0 +1,234 @@
+"""Benchmark suite for the comparison pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --scale small
+    python -m benchmarks.run_benchmarks --scale medium --rows 5000 --change-rate 0.1
+    python -m benchmarks.run_benchmarks --scale small --check            # fail on regressions
+    python -m benchmarks.run_benchmarks --scale small --update-baseline  # store new baselines
+
+Each case reports the median wall time over --repeat runs and the peak
+Python heap usage (tracemalloc) of one extra run. Startup cases run in a
+fresh interpreter and are also checked against --startup-budget.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.workbook_gen import SCALES, WorkbookSpec, generate_pair
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.excel_parser import ExcelParser
+from excel_diff.git_reader import GitReader
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Fresh-interpreter startup paths: what main.py does before creating the window
+# (the webview import itself is excluded), and the backend import done behind it
+STARTUP_CASES = {
+    "startup/launcher_ready": "import main; main.deps_cached()",
+    "startup/backend_import": "import app",
+}
+
+def _materialize(sheets) -> dict:
+    """Forces every lazily parsed sheet so parse cost is actually measured."""
+    return {name: rows for name, rows in sheets.items()}
+
+def _measure(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak
+
+def measure_startup(repeat: int) -> dict:
+    results = {}
+    for key, code in STARTUP_CASES.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True, capture_output=True)
+            timings.append(time.perf_counter() - start)
+        results[key] = {"median_s": round(statistics.median(timings), 6)}
+    return results
+
+def _git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+def _make_repo(work_dir, path_a, path_b, ext):
+    """Creates a local repository holding version A and B of the same workbook as two commits."""
+    repo = os.path.join(work_dir, "repo")
+    os.makedirs(repo)
+    _git(repo, "init", "-q")
+    _git(repo, "config", "user.email", "bench@example.com")
+    _git(repo, "config", "user.name", "bench")
+    target = f"data/book{ext}"
+    os.makedirs(os.path.join(repo, "data"))
+    hashes = []
+    for source in (path_a, path_b):
+        shutil.copyfile(source, os.path.join(repo, target))
+        _git(repo, "add", target)
+        _git(repo, "commit", "-q", "-m", f"update {os.path.basename(source)}")
+        hashes.append(_git(repo, "rev-parse", "HEAD"))
+    return repo, target, hashes
+
+def _in_dir(path, fn):
+    """GitReader reads local repositories from the working directory."""
+    def run():
+        previous = os.getcwd()
+        os.chdir(path)
+        try:
+            return fn()
+        finally:
+            os.chdir(previous)
+    return run
+
+def build_cases(work_dir: str, spec: WorkbookSpec, ext: str):
+    path_a, path_b = generate_pair(work_dir, spec, ext)
+    data_a = _materialize(ExcelParser(path_a).parse())
+    data_b = _materialize(ExcelParser(path_b).parse())
+    cases = {
+        f"parse{ext}": lambda: _materialize(ExcelParser(path_a).parse()),
+        f"compare{ext}": lambda: DiffEngine(data_a, data_b).compare(),
+        f"route_upload{ext}": _route_case(path_a, path_b),
+    }
+
+    repo, target, (hash_a, hash_b) = _make_repo(work_dir, path_a, path_b, ext)
+    fetch_dir = os.path.join(work_dir, "fetched")
+    os.makedirs(fetch_dir)
+    cases[f"git_fetch{ext}"] = _in_dir(repo, lambda: (
+        GitReader.fetch_excel_by_commit(hash_a, target, fetch_dir),
+        GitReader.fetch_excel_by_commit(hash_b, target, fetch_dir),
+    ))
+    cases[f"git_history{ext}"] = _in_dir(repo, lambda: GitReader.fetch_commit_history("HEAD", target))
+    return cases
+
+def _route_case(path_a, path_b):
+    from app import app
+    client = app.test_client()
+
+    def run():
+        with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+            response = client.post("/", data={
+                "source_a": "pc", "source_b": "pc",
+                "file_a": (fa, os.path.basename(path_a)),
+                "file_b": (fb, os.path.basename(path_b)),
+            }, content_type="multipart/form-data")
+            response.get_data()
+            response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"Route returned {response.status_code}")
+    return run
+
+def _xlwt_available():
+    try:
+        import xlwt  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def compare_to_baseline(results: dict, baselines: dict, tolerance: float):
+    """Returns human readable regression messages for cases slower or bigger than baseline * tolerance."""
+    regressions = []
+    for key, result in results.items():
+        base = baselines.get(key)
+        if not base:
+            continue
+        if result["median_s"] > base["median_s"] * tolerance:
+            regressions.append(f"{key}: time {result['median_s']:.4f}s vs baseline {base['median_s']:.4f}s")
+        if "peak_kb" in base and result["peak_kb"] > base["peak_kb"] * tolerance:
+            regressions.append(f"{key}: peak {result['peak_kb']:.0f}KB vs baseline {base['peak_kb']:.0f}KB")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parse, diff, routes and Git fetches.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--rows", type=int)
+    parser.add_argument("--cols", type=int)
+    parser.add_argument("--sheets", type=int)
+    parser.add_argument("--shared-string-ratio", type=float)
+    parser.add_argument("--sparsity", type=float)
+    parser.add_argument("--change-rate", type=float)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", default=".xlsx,.xls", help="Comma separated list of extensions")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor against baselines")
+    parser.add_argument("--startup-budget", type=float, default=0.5,
+                        help="Seconds allowed before the launcher can create its window")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ("rows", "cols", "sheets", "shared_string_ratio", "sparsity", "change_rate")
+        if getattr(args, field) is not None
+    }
+    spec = dataclasses.replace(SCALES[args.scale], **overrides)
+    scale_name = args.scale if not overrides else "custom"
+    print(f"[*] Scale {scale_name}: {spec}")
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="excel_bench_")
+    try:
+        for ext in [e.strip() for e in args.formats.split(",") if e.strip()]:
+            if ext == ".xls" and not _xlwt_available():
+                print("[!] Skipping .xls cases: xlwt is not installed")
+                continue
+            ext_dir = os.path.join(work_dir, ext.strip("."))
+            os.makedirs(ext_dir)
+            for name, fn in build_cases(ext_dir, spec, ext).items():
+                median, peak = _measure(fn, args.repeat)
+                key = f"{scale_name}/{name}"
+                results[key] = {"median_s": round(median, 6), "peak_kb": round(peak / 1024, 1)}
+                print(f"{key:<36} {median * 1000:>10.2f} ms {peak / 1024:>12.1f} KB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    startup = measure_startup(args.repeat)
+    for key, result in startup.items():
+        print(f"{key:<36} {result['median_s'] * 1000:>10.2f} ms")
+    results.update(startup)
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baselines = json.load(f)
+
+    if args.update_baseline:
+        baselines.update(results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"[+] Baselines written to {BASELINE_FILE}")
+        return 0
+
+    regressions = compare_to_baseline(results, baselines, args.tolerance)
+    launcher = startup["startup/launcher_ready"]["median_s"]
+    if launcher > args.startup_budget:
+        regressions.append(f"startup/launcher_ready: {launcher:.3f}s exceeds the {args.startup_budget:.3f}s budget")
+    for message in regressions:
+        print(f"[!] Regression {message}")
+    if not regressions:
+        print("[+] No regressions against stored baselines")
+    return 1 if regressions and args.check else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
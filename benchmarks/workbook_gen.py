@@ -0,0 +1,160 @@
+"""Synthetic workbook generator for the benchmark suite.
+
+Writes minimal but valid .xlsx files straight through zipfile (no extra
+dependency) and .xls files through xlwt when it is installed.
+"""
+import os
+import random
+import zipfile
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+@dataclass
+class WorkbookSpec:
+    rows: int = 200
+    cols: int = 10
+    sheets: int = 2
+    shared_string_ratio: float = 0.5  # share of non-empty cells that are text (shared strings)
+    sparsity: float = 0.1             # share of cells left empty
+    change_rate: float = 0.02         # share of cells that differ between version A and B
+    seed: int = 1
+
+SCALES = {
+    "small": WorkbookSpec(rows=200, cols=10, sheets=2),
+    "medium": WorkbookSpec(rows=2000, cols=20, sheets=3),
+    "large": WorkbookSpec(rows=20000, cols=30, sheets=4),
+}
+
+def generate_sheets(spec: WorkbookSpec):
+    """Returns (sheets_a, sheets_b) as {name: rows} with values as str, int or None."""
+    rnd = random.Random(spec.seed)
+    vocabulary = [f"item-{i}" for i in range(max(16, int(spec.rows * spec.cols * 0.05)))]
+
+    def value():
+        if rnd.random() < spec.sparsity:
+            return None
+        if rnd.random() < spec.shared_string_ratio:
+            return rnd.choice(vocabulary)
+        return rnd.randint(0, 1_000_000)
+
+    sheets_a, sheets_b = {}, {}
+    for s in range(spec.sheets):
+        name = f"Sheet{s + 1}"
+        rows_a = [[value() for _ in range(spec.cols)] for _ in range(spec.rows)]
+        rows_b = []
+        for row in rows_a:
+            rows_b.append([value() if rnd.random() < spec.change_rate else v for v in row])
+        sheets_a[name] = rows_a
+        sheets_b[name] = rows_b
+    return sheets_a, sheets_b
+
+def write_workbook(path: str, sheets: dict):
+    if path.lower().endswith(".xls"):
+        _write_xls(path, sheets)
+    else:
+        _write_xlsx(path, sheets)
+
+def generate_pair(target_dir: str, spec: WorkbookSpec, ext: str = ".xlsx"):
+    """Writes version A and B of a synthetic workbook and returns both paths."""
+    sheets_a, sheets_b = generate_sheets(spec)
+    path_a = os.path.join(target_dir, f"bench_a{ext}")
+    path_b = os.path.join(target_dir, f"bench_b{ext}")
+    write_workbook(path_a, sheets_a)
+    write_workbook(path_b, sheets_b)
+    return path_a, path_b
+
+def col_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+def _write_xlsx(path: str, sheets: dict):
+    strings = {}
+    sheet_xml = []
+    for rows in sheets.values():
+        parts = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet xmlns="{_MAIN_NS}"><sheetData>']
+        for r, row in enumerate(rows, start=1):
+            cells = []
+            for c, val in enumerate(row):
+                if val is None:
+                    continue
+                ref = f"{col_letter(c)}{r}"
+                if isinstance(val, str):
+                    idx = strings.setdefault(val, len(strings))
+                    cells.append(f'<c r="{ref}" t="s"><v>{idx}</v></c>')
+                else:
+                    cells.append(f'<c r="{ref}"><v>{val}</v></c>')
+            parts.append(f'<row r="{r}">{"".join(cells)}</row>')
+        parts.append("</sheetData></worksheet>")
+        sheet_xml.append("".join(parts))
+
+    names = list(sheets.keys())
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        + "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i + 1}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(len(names))
+        )
+        + "</Types>"
+    )
+    root_rels = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PKG_REL_NS}">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    )
+    workbook = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+        + "".join(f'<sheet name="{escape(n)}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i, n in enumerate(names))
+        + "</sheets></workbook>"
+    )
+    workbook_rels = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PKG_REL_NS}">'
+        + "".join(
+            f'<Relationship Id="rId{i + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i + 1}.xml"/>'
+            for i in range(len(names))
+        )
+        + f'<Relationship Id="rId{len(names) + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+        'Target="sharedStrings.xml"/></Relationships>'
+    )
+    shared = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><sst xmlns="{_MAIN_NS}" count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + "".join(f"<si><t>{escape(text)}</t></si>" for text in strings)
+        + "</sst>"
+    )
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", content_types)
+        z.writestr("_rels/.rels", root_rels)
+        z.writestr("xl/workbook.xml", workbook)
+        z.writestr("xl/_rels/workbook.xml.rels", workbook_rels)
+        z.writestr("xl/sharedStrings.xml", shared)
+        for i, xml in enumerate(sheet_xml):
+            z.writestr(f"xl/worksheets/sheet{i + 1}.xml", xml)
+
+def _write_xls(path: str, sheets: dict):
+    try:
+        import xlwt
+    except ImportError:
+        raise RuntimeError("xlwt is required to generate .xls benchmark files (pip install xlwt)")
+    book = xlwt.Workbook()
+    for name, rows in sheets.items():
+        ws = book.add_sheet(name)
+        for r, row in enumerate(rows[:65535]):  # BIFF8 row limit
+            for c, val in enumerate(row[:256]):
+                if val is not None:
+                    ws.write(r, c, val)
+    book.save(path)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from excel_diff.excel_parser import SheetRows
+from excel_diff.wire import CompactEncoder, decode_diff
+
+class DirectoryCache:
+    """JSON documents in a folder, shared by every worker process that points at it.
+
+    Writes go through a temp file and os.replace, so readers in other
+    processes never see a partial document. Once the folder grows past
+    max_bytes the least recently used documents are removed.
+    """
+    PRUNE_EVERY = 20  # writes between size checks
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder, name + ".json")
+
+    def _read(self, name: str):
+        path = self._path(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # Recently used: keep it when pruning
+        except OSError:
+            pass
+        return document
+
+    def _write(self, name: str, document):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = os.path.join(self.folder, f".{name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(tmp_path, self._path(name))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def _exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    def prune(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+class ResultStore(DirectoryCache):
+    """Stored comparison results ({result id: result dict}) readable from any worker.
+
+    Diffs are kept in the compact wire encoding, so a result costs a fraction
+    of its in-memory size on disk.
+    """
+    def __init__(self, folder: str, max_bytes: int = 1024 ** 3):
+        super().__init__(folder, max_bytes)
+
+    @staticmethod
+    def _name(result_id):
+        return "result-" + hashlib.sha256(str(result_id).encode("utf-8")).hexdigest()
+
+    def __setitem__(self, result_id, result: dict):
+        encoder = CompactEncoder()
+        document = dict(result, diff=[encoder.encode_sheet(sheet) for sheet in result.get("diff", [])])
+        self._write(self._name(result_id), document)
+
+    def __getitem__(self, result_id) -> dict:
+        document = self._read(self._name(result_id))
+        if document is None:
+            raise KeyError(result_id)
+        document["diff"] = decode_diff(document["diff"])
+        return document
+
+    def __contains__(self, result_id) -> bool:
+        return self._exists(self._name(result_id))
+
+    def get(self, result_id, default=None):
+        try:
+            return self[result_id]
+        except KeyError:
+            return default
+
+class ParseCache(DirectoryCache):
+    """Parsed sheets keyed by the sheet's fingerprint and the range that was read.
+
+    Commit versions never change, so a workbook fetched again by any worker
+    (or a re-compare landing on a different worker) skips parsing.
+    """
+    def __init__(self, folder: str, max_bytes: int = 2 * 1024 ** 3):
+        super().__init__(folder, max_bytes)
+
+    @staticmethod
+    def _name(key):
+        return "sheet-" + hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        document = self._read(self._name(key))
+        if document is None:
+            return None
+        return SheetRows(document["rows"], document["row_offset"], document["col_offset"])
+
+    def put(self, key, rows):
+        self._write(self._name(key), {
+            "row_offset": getattr(rows, "row_offset", 0),
+            "col_offset": getattr(rows, "col_offset", 0),
+            "rows": rows,
+        })
@@ -1,15 +1,26 @@
+from excel_diff.metrics import NULL_METRICS
+
 class DiffEngine:
-    def __init__(self, excel_a: dict, excel_b: dict):
+    def __init__(self, excel_a: dict, excel_b: dict, metrics=None, skip_identical=True):
         self.excel_a = excel_a
         self.excel_b = excel_b
+        self.metrics = metrics or NULL_METRICS
+        # Byte-identical sheets come back as "unchanged" with no rows; exports need their cells
+        self.skip_identical = skip_identical
 
     def compare(self) -> list:
-        result = [] 
+        return list(self.iter_compare())
+
+    def iter_compare(self):
+        """Yields one sheet result at a time so callers can stream them."""
         names_a = list(self.excel_a.keys())
         names_b = list(self.excel_b.keys())
         
         num_sheets = max(len(names_a), len(names_b))
 
+        # Byte-identical workbooks (e.g. the same blob at two commits) need no parsing at all
+        identical_workbooks = self.skip_identical and self._same_workbook()
+
         for i in range(num_sheets):
             real_key_a = names_a[i] if i < len(names_a) else None
             real_key_b = names_b[i] if i < len(names_b) else None
@@ -19,23 +30,70 @@ class DiffEngine:
             display_name_b = real_key_b if real_key_b else "MISSING"
             
             is_match = (real_key_a == real_key_b) if (real_key_a and real_key_b) else False
+
+            if (self.skip_identical and real_key_a and real_key_b
+                    and (identical_workbooks or self._same_fingerprint(real_key_a, real_key_b))):
+                self.metrics.add("sheets_skipped", 1)
+                yield {
+                    "name_a": display_name_a,
+                    "name_b": display_name_b,
+                    "is_match": is_match,
+                    "unchanged": True,
+                    "data": {"max_cols": 0, "col_offset": 0, "rows": []}
+                }
+                continue
             
             # Extract rows; if a sheet is missing, pass an empty list []
             rows_a = self.excel_a.get(real_key_a, []) if real_key_a else []
             rows_b = self.excel_b.get(real_key_b, []) if real_key_b else []
 
             # Even if names don't match, we compare the rows by position
-            sheet_diff = self._compare_sheet(rows_a, rows_b)
+            # Sheets read from a selected range carry the position of its top-left cell
+            offsets = rows_a if hasattr(rows_a, "row_offset") else rows_b
+            row_offset = getattr(offsets, "row_offset", 0)
+            col_offset = getattr(offsets, "col_offset", 0)
+
+            with self.metrics.stage("diff"):
+                sheet_diff = self._compare_sheet(rows_a, rows_b, row_offset, col_offset)
+            self.metrics.add("cells_diffed", len(sheet_diff["rows"]) * sheet_diff["max_cols"])
             
-            result.append({
+            yield {
                 "name_a": display_name_a,
                 "name_b": display_name_b,
                 "is_match": is_match,
                 "data": sheet_diff
-            })
-        return result
+            }
+
+    def _same_workbook(self) -> bool:
+        """True when both workbooks carry a fingerprint and they match; a size mismatch settles it first."""
+        size_a = getattr(self.excel_a, "workbook_size", None)
+        size_b = getattr(self.excel_b, "workbook_size", None)
+        if size_a is not None and size_b is not None and size_a != size_b:
+            return False
+        workbook_a = getattr(self.excel_a, "workbook_fingerprint", None)
+        return workbook_a is not None and workbook_a == getattr(self.excel_b, "workbook_fingerprint", None)
+
+    def _same_fingerprint(self, key_a, key_b) -> bool:
+        """True when both sheets carry a zip-level fingerprint and they match, i.e. the XML is byte-identical."""
+        fingerprint_a = getattr(self.excel_a, "fingerprint", None)
+        fingerprint_b = getattr(self.excel_b, "fingerprint", None)
+        if fingerprint_a is None or fingerprint_b is None:
+            return False
+        value_a = fingerprint_a(key_a)
+        return value_a is not None and value_a == fingerprint_b(key_b)
 
-    def _compare_sheet(self, rows_a, rows_b):
+    @staticmethod
+    def count_row_changes(sheet: dict) -> int:
+        """Counts rows of a sheet result that contain at least one real change."""
+        if not sheet.get('data') or 'rows' not in sheet['data']:
+            return 0
+        total = 0
+        for row in sheet['data']['rows']:
+            if any(cell.get('status') != 'equal' and (cell.get('a') or cell.get('b')) for cell in row.get('cells', [])):
+                total += 1
+        return total
+
+    def _compare_sheet(self, rows_a, rows_b, row_offset=0, col_offset=0):
         max_rows = max(len(rows_a), len(rows_b))
         
         # Calculate max columns
@@ -47,31 +105,33 @@ class DiffEngine:
         for r in range(max_rows):
             row_a = rows_a[r] if r < len(rows_a) else []
             row_b = rows_b[r] if r < len(rows_b) else []
+            rows.append(self._compare_row(row_a, row_b, r, max_cols, row_offset, col_offset))
+
+        return {"max_cols": max_cols, "col_offset": col_offset, "rows": rows}
+
+    def _compare_row(self, row_a, row_b, r, max_cols, row_offset=0, col_offset=0):
+        cells = []
+        for c in range(max_cols):
+            val_a = row_a[c] if c < len(row_a) else None
+            val_b = row_b[c] if c < len(row_b) else None
+
+            v_a = str(val_a).strip() if val_a is not None else ""
+            v_b = str(val_b).strip() if val_b is not None else ""
+
+            if v_a == v_b:
+                status = "equal"
+            elif v_a and not v_b:
+                status = "deleted"
+            elif v_b and not v_a:
+                status = "added"
+            else:
+                status = "modified"
+
+            cells.append({
+                "col": c + col_offset,
+                "a": val_a if val_a is not None else "",
+                "b": val_b if val_b is not None else "",
+                "status": status
+            })
 
-            cells = []
-            for c in range(max_cols):
-                val_a = row_a[c] if c < len(row_a) else None
-                val_b = row_b[c] if c < len(row_b) else None
-
-                v_a = str(val_a).strip() if val_a is not None else ""
-                v_b = str(val_b).strip() if val_b is not None else ""
-
-                if v_a == v_b:
-                    status = "equal"
-                elif v_a and not v_b:
-                    status = "deleted"
-                elif v_b and not v_a:
-                    status = "added"
-                else:
-                    status = "modified"
-
-                cells.append({
-                    "col": c,
-                    "a": val_a if val_a is not None else "",
-                    "b": val_b if val_b is not None else "",
-                    "status": status
-                })
-
-            rows.append({"row_index": r+1, "cells": cells})
-
-        return {"max_cols": max_cols, "rows": rows}
\ No newline at end of file
+        return {"row_index": r + 1 + row_offset, "cells": cells}
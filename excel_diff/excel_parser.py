@@ -1,51 +1,280 @@
+import functools
+import os
 import zipfile
+import zlib
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+from collections.abc import Mapping
 import re
-import xlrd  # For .xls files
+
+from excel_diff.metrics import NULL_METRICS
 
 class ExcelParserError(Exception):
     pass
 
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_ROW_TAG = _MAIN_NS + "row"
+_CELL_TAG = _MAIN_NS + "c"
+_VALUE_TAG = _MAIN_NS + "v"
+
+# (first_row, first_col, last_row, last_col), zero-based and inclusive; None means unbounded
+FULL_RANGE = (0, 0, None, None)
+
+def parse_cell_range(text: str) -> tuple:
+    """Parses an A1-style range ("A1:Z5000", "B2", "C:F", "10:200") into FULL_RANGE-style bounds."""
+    match = re.fullmatch(r"\$?([A-Za-z]*)\$?(\d*)(?::\$?([A-Za-z]*)\$?(\d*))?", text.strip())
+    if not match or not any(match.groups()):
+        raise ExcelParserError(f"Invalid cell range: {text!r}")
+    col_a, row_a, col_b, row_b = match.groups()
+    if ":" not in text:
+        col_b, row_b = col_a, row_a
+    elif not (col_a or row_a) or not (col_b or row_b):
+        raise ExcelParserError(f"Invalid cell range: {text!r}")  # "A1:" or ":B5" is a typo, not the whole sheet
+
+    def to_col(letters):
+        return _letters_to_index(letters.upper()) if letters else None
+
+    def to_row(digits):
+        return int(digits) - 1 if digits else None
+
+    first_row, last_row = to_row(row_a), to_row(row_b)
+    first_col, last_col = to_col(col_a), to_col(col_b)
+    if (first_row is not None and first_row < 0) or (last_row is not None and last_row < 0):
+        raise ExcelParserError(f"Invalid cell range: {text!r}")
+    if first_row is not None and last_row is not None and first_row > last_row:
+        first_row, last_row = last_row, first_row
+    if first_col is not None and last_col is not None and first_col > last_col:
+        first_col, last_col = last_col, first_col
+    return (first_row or 0, first_col or 0, last_row, last_col)
+
+def parse_range_specs(entries) -> dict:
+    """Turns ["A1:Z50", "Data!B2:F9", "'My Sheet'!C:C"] into {sheet name or None: bounds}.
+
+    An entry without a sheet prefix applies to every selected sheet.
+    """
+    ranges = {}
+    for entry in entries or []:
+        entry = entry.strip()
+        if not entry:
+            continue
+        sheet, _, cells = entry.rpartition("!")
+        sheet = sheet.strip()
+        if len(sheet) >= 2 and sheet[0] == sheet[-1] == "'":
+            sheet = sheet[1:-1].replace("''", "'")
+        ranges[sheet or None] = parse_cell_range(cells)
+    return ranges
+
+def _letters_to_index(col_letters: str) -> int:
+    index = 0
+    for char in col_letters:
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+class SheetRows(list):
+    """Rows of one sheet. When a range was selected, row_offset/col_offset locate its top-left cell."""
+    def __init__(self, rows=(), row_offset=0, col_offset=0):
+        super().__init__(rows)
+        self.row_offset = row_offset
+        self.col_offset = col_offset
+
+
+class LazySheets(Mapping):
+    """Read-only {sheet name: rows} mapping that parses a sheet only when it is accessed.
+
+    Parsed rows are not kept, so a consumer that walks the sheets one by one
+    only ever holds a single sheet in memory.
+
+    Fingerprints are cheap identity keys taken from the file without parsing:
+    equal fingerprints on two workbooks mean the sheet (or the whole file) is
+    byte-identical, so a diff can skip it. workbook_fingerprint may be a
+    callable, evaluated on first access; workbook_size, when given, lets a
+    diff tell different files apart without computing it.
+    """
+    def __init__(self, names, loader, fingerprints=None, workbook_fingerprint=None, workbook_size=None):
+        self._names = list(names)
+        self._known = set(self._names)
+        self._loader = loader
+        self._fingerprints = fingerprints or {}
+        self._workbook_fingerprint = workbook_fingerprint
+        self.workbook_size = workbook_size
+
+    @property
+    def workbook_fingerprint(self):
+        if callable(self._workbook_fingerprint):
+            self._workbook_fingerprint = self._workbook_fingerprint()
+        return self._workbook_fingerprint
+
+    def fingerprint(self, name):
+        return self._fingerprints.get(name)
+
+    def __getitem__(self, name):
+        if name not in self._known:
+            raise KeyError(name)
+        return self._loader(name)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
 class ExcelParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, metrics=None, cache=None):
         self.file_path = file_path
+        self.metrics = metrics or NULL_METRICS
+        self.cache = cache  # Optional ParseCache shared between requests/processes
+        self._shared_strings = None
+        self._sheet_members = {}
+        self._xls_book = None
+        self._xls_pending = set()
+        self._ranges = {}
+
+    def parse(self, sheets=None, ranges=None) -> Mapping:
+        """Returns the workbook as a lazy {sheet name: rows} mapping.
+
+        sheets limits the result to the named sheets and ranges maps a sheet
+        name, or None for all sheets, to bounds from parse_range_specs.
+        Unselected sheets are never read and rows past a range's end are never
+        parsed. A sheet name that is not in the workbook, selected or used as
+        a range prefix, raises ExcelParserError listing the sheets there are.
+        """
+        self._ranges = ranges or {}
+        selected = set(sheets) if sheets else None
 
-    def parse(self) -> dict:
         # Route based on file extension
         if self.file_path.lower().endswith('.xls'):
-            return self._parse_xls()
+            return self._parse_xls(selected)
         
         # Existing .xlsx logic
         if not zipfile.is_zipfile(self.file_path):
             raise ExcelParserError("Invalid XLSX file or unsupported format")
 
+        # Only the sheet list and the zip directory are read here; each sheet's XML is parsed on first access
         with zipfile.ZipFile(self.file_path, "r") as z:
-            shared_strings = self._read_shared_strings(z)
-            sheets = self._read_sheets(z, shared_strings)
+            self._sheet_members = self._resolve_sheet_members(z)
+            self._check_selection(self._sheet_members, selected)
+            if selected is not None:
+                self._sheet_members = {n: m for n, m in self._sheet_members.items() if n in selected}
+            fingerprints, workbook_fingerprint = self._zip_fingerprints(z)
+
+        loader = self._cached(self._load_sheet, lambda name: fingerprints[name])
+        return LazySheets(self._sheet_members.keys(), loader, fingerprints, workbook_fingerprint)
+
+    def _check_selection(self, available, selected):
+        """Rejects selected sheets and range prefixes the workbook does not have: a typo must not look like no changes."""
+        requested = set(selected or ()) | {name for name in self._ranges if name is not None}
+        unknown = sorted(requested - set(available))
+        if unknown:
+            raise ExcelParserError(
+                f"Sheet {', '.join(repr(n) for n in unknown)} not found in {os.path.basename(self.file_path)}. "
+                f"Available sheets: {', '.join(available)}")
+
+    def _zip_fingerprints(self, z):
+        """Builds per-sheet and whole-workbook fingerprints from the zip directory's CRC32s and sizes.
+
+        A sheet's XML refers to shared strings by index, so its fingerprint
+        includes sharedStrings.xml as well.
+        """
+        infos = {info.filename: (info.CRC, info.file_size) for info in z.infolist()}
+        shared = infos.get("xl/sharedStrings.xml")
+        fingerprints = {name: (infos[member], shared) for name, member in self._sheet_members.items()}
+        return fingerprints, tuple(sorted(infos.items()))
+
+    def _bounds(self, name):
+        return self._ranges.get(name) or self._ranges.get(None) or FULL_RANGE
+
+    def _load_sheet(self, name):
+        with self.metrics.stage("parse"):
+            with zipfile.ZipFile(self.file_path, "r") as z:
+                if self._shared_strings is None:
+                    self._shared_strings = self._read_shared_strings(z)
+                with z.open(self._sheet_members[name]) as stream:
+                    return self._read_sheet(stream, self._shared_strings, self._bounds(name))
+
+    def _parse_xls(self, selected=None) -> Mapping:
+        """Parses legacy .xls files and returns the same lazy sheet mapping as the XLSX parser."""
+        try:
+            book = self._open_xls()
+        except Exception as e:
+            raise ExcelParserError(f"Error reading .xls file: {e}")
+        self._check_selection(book.sheet_names(), selected)
+        names = [n for n in book.sheet_names() if selected is None or n in selected]
+        self._xls_pending = set(names)
+        # The CRC is only taken when a diff or the parse cache needs it: workbooks of different sizes never do
+        workbook_fingerprint = functools.lru_cache(maxsize=None)(self._file_fingerprint)
+        loader = self._cached(self._load_xls_sheet, lambda name: workbook_fingerprint())
+        return LazySheets(names, loader, workbook_fingerprint=workbook_fingerprint,
+                          workbook_size=os.path.getsize(self.file_path))
+
+    def _cached(self, loader, fingerprint_of):
+        """Wraps a sheet loader with the parse cache, keyed by fingerprint, sheet name and bounds."""
+        if self.cache is None:
+            return loader
+
+        def load(name):
+            key = (fingerprint_of(name), name, self._bounds(name))
+            with self.metrics.stage("parse"):
+                rows = self.cache.get(key)
+            if rows is None:
+                rows = loader(name)
+                self.cache.put(key, rows)
+            else:
+                self.metrics.add("parse_cache_hits", 1)
+                self._sheet_done(name)
+            return rows
+        return load
 
-        return sheets
+    def _file_fingerprint(self):
+        """(size, CRC32) of the whole file; .xls has no per-sheet checksums to compare."""
+        crc = 0
+        with open(self.file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                crc = zlib.crc32(chunk, crc)
+        return (os.path.getsize(self.file_path), crc)
 
-    def _parse_xls(self) -> dict:
-        """Parses legacy .xls files and returns the same structure as XLSX parser."""
+    def _open_xls(self):
+        import xlrd  # For .xls files; imported on first use to keep startup fast
+        with self.metrics.stage("parse"):
+            # on_demand: only the workbook globals are read now, sheets are loaded one at a time
+            self._xls_book = xlrd.open_workbook(self.file_path, on_demand=True)
+        return self._xls_book
+
+    def _load_xls_sheet(self, name):
         try:
-            workbook = xlrd.open_workbook(self.file_path)
-            sheets = {}
-            for sheet in workbook.sheets():
-                rows = []
-                for r in range(sheet.nrows):
-                    row_data = []
-                    for val in sheet.row_values(r):
-                        # Clean up numbers: if it's 10.0, treat it as "10"
-                        if isinstance(val, float) and val.is_integer():
-                            row_data.append(str(int(val)))
-                        else:
-                            row_data.append(str(val) if val is not None else "")
-                    rows.append(row_data)
-                sheets[sheet.name] = rows
-            return sheets
+            with self.metrics.stage("parse"):
+                book = self._xls_book or self._open_xls()
+                rows = self._read_xls_sheet(book.sheet_by_name(name), self._bounds(name))
+                book.unload_sheet(name)
         except Exception as e:
             raise ExcelParserError(f"Error reading .xls file: {e}")
+        self._sheet_done(name)
+        return rows
+
+    def _sheet_done(self, name):
+        # Release the .xls file once every sheet has been read (it would be reopened on a later access)
+        self._xls_pending.discard(name)
+        if not self._xls_pending:
+            self.close()
+
+    def _read_xls_sheet(self, sheet, bounds=FULL_RANGE) -> list:
+        """Converts a sheet row by row in one comprehension; text cells pass through untouched."""
+        first_row, first_col, last_row, last_col = bounds
+        end_row = sheet.nrows if last_row is None else min(sheet.nrows, last_row + 1)
+        end_col = sheet.ncols if last_col is None else min(sheet.ncols, last_col + 1)
+        self.metrics.add("cells_parsed", max(end_row - first_row, 0) * max(end_col - first_col, 0))
+        # Numbers, dates, booleans and error codes become text; 10.0 is shown as "10"
+        rows = [
+            [v if v.__class__ is str else (str(int(v)) if v.__class__ is float and v.is_integer() else str(v))
+             for v in sheet.row_values(r, first_col, end_col)]
+            for r in range(first_row, end_row)
+        ]
+        return SheetRows(rows, first_row, first_col)
+
+    def close(self):
+        """Releases the open .xls workbook, if any. XLSX sheets hold no open handles."""
+        if self._xls_book is not None:
+            self._xls_book.release_resources()
+            self._xls_book = None
 
     def _read_shared_strings(self, z):
         try:
@@ -60,57 +289,62 @@ class ExcelParser:
             strings.append(text)
         return strings
 
-    def _read_sheets(self, z, shared_strings):
+    def _resolve_sheet_members(self, z):
+        """Maps each sheet name to its worksheet XML member, in workbook order."""
         workbook_xml = z.read("xl/workbook.xml")
         workbook = ET.fromstring(workbook_xml)
         ns = {"a": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
               "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships"}
-        sheets = {}
+        members = set(z.namelist())
+        sheet_members = {}
         for i, sheet_node in enumerate(workbook.findall("a:sheets/a:sheet", ns)):
             name = sheet_node.attrib["name"]
-            path = f"xl/worksheets/sheet{i+1}.xml" 
-            try:
-                xml = z.read(path)
-                sheets[name] = self._read_sheet(xml, shared_strings)
-            except KeyError:
+            path = f"xl/worksheets/sheet{i+1}.xml"
+            if path not in members:
                 s_id = sheet_node.attrib.get("sheetId")
-                try:
-                    xml = z.read(f"xl/worksheets/sheet{s_id}.xml")
-                    sheets[name] = self._read_sheet(xml, shared_strings)
-                except:
+                path = f"xl/worksheets/sheet{s_id}.xml"
+                if path not in members:
                     continue
-        return sheets
+            sheet_members[name] = path
+        return sheet_members
 
-    def _read_sheet(self, xml_bytes, shared_strings):
-        root = ET.fromstring(xml_bytes)
-        ns = {"a": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    def _read_sheet(self, source, shared_strings, bounds=FULL_RANGE):
+        """Streams <row> elements and stops at the first row past the end of the range."""
+        first_row, first_col, last_row, last_col = bounds
         rows_dict = defaultdict(dict)
-        max_col = 0
-        for row in root.findall(".//a:row", ns):
+        max_col = first_col
+        cell_count = 0
+        for _, row in ET.iterparse(source, events=("end",)):
+            if row.tag != _ROW_TAG:
+                continue
             row_idx = int(row.attrib["r"]) - 1
-            for cell in row.findall("a:c", ns):
-                ref = cell.attrib.get("r")
-                col_idx = self._col_to_index(ref)
-                cell_type = cell.attrib.get("t")
-                value_elem = cell.find("a:v", ns)
-                value = value_elem.text if value_elem is not None else ""
-                if cell_type == "s":
-                    value = shared_strings[int(value)]
-                rows_dict[row_idx][col_idx] = value
-                max_col = max(max_col, col_idx)
+            if last_row is not None and row_idx > last_row:
+                break
+            if row_idx >= first_row:
+                for cell in row.iterfind(_CELL_TAG):
+                    ref = cell.attrib.get("r")
+                    col_idx = self._col_to_index(ref)
+                    if col_idx < first_col or (last_col is not None and col_idx > last_col):
+                        continue
+                    cell_type = cell.attrib.get("t")
+                    value_elem = cell.find(_VALUE_TAG)
+                    value = value_elem.text if value_elem is not None else ""
+                    if cell_type == "s":
+                        value = shared_strings[int(value)]
+                    rows_dict[row_idx][col_idx] = value
+                    max_col = max(max_col, col_idx)
+                    cell_count += 1
+            row.clear()
+        self.metrics.add("cells_parsed", cell_count)
         rows = []
-        max_row = max(rows_dict.keys(), default=-1)
-        for r in range(max_row + 1):
+        max_row = max(rows_dict.keys(), default=first_row - 1)
+        for r in range(first_row, max_row + 1):
             row = []
-            for c in range(max_col + 1):
+            for c in range(first_col, max_col + 1):
                 row.append(rows_dict[r].get(c, ""))
             rows.append(row)
-        return rows
+        return SheetRows(rows, first_row, first_col)
 
     def _col_to_index(self, cell_ref: str) -> int:
         match = re.match(r"([A-Z]+)", cell_ref)
-        col_letters = match.group(1)
-        index = 0
-        for char in col_letters:
-            index = index * 26 + (ord(char) - ord("A") + 1)
-        return index - 1
\ No newline at end of file
+        return _letters_to_index(match.group(1))
@@ -0,0 +1,336 @@
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+CHECKPOINT_ROWS = 500  # diff rows written between output flushes
+PARQUET_BATCH_CELLS = 64 * 1024
+
+# Cell styles in the exported workbook (cellXfs index); equal cells stay unstyled
+_XLSX_STYLES = {"modified": 1, "added": 2, "deleted": 3}
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_TITLE_INVALID = re.compile(r"[\[\]:*?/\\]")
+_MAX_CELL_TEXT = 32767
+_IDENTICAL_NOTE = "Identical in both workbooks; contents were not loaded"
+_MISSING_SHEET = "MISSING"  # DiffEngine's name for the side a sheet does not exist on
+
+class ExportError(Exception):
+    """Unknown export format or a missing optional dependency; status is the HTTP code to answer with."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def column_letter(index: int) -> str:
+    """0-based column index to its A1 letters (0 -> A, 26 -> AA)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+def is_change(cell) -> bool:
+    """Same rule DiffEngine.count_row_changes uses: a non-equal status on a non-blank cell."""
+    return cell["status"] != "equal" and bool(cell["a"] or cell["b"])
+
+def export_diff(diff, fmt: str, out, changed_only: bool = True):
+    """Writes diff sheets (a list or DiffEngine.iter_compare()) to a path or binary file.
+
+    changed_only limits CSV and Parquet output to changed cells; the XLSX
+    export always holds every non-blank cell, with changes highlighted.
+
+    Sheets DiffEngine skipped as byte-identical ("unchanged", no rows) have
+    no cells to write, so the XLSX and full CSV/Parquet output get a one-line
+    note for them instead. Diff with skip_identical=False to export them whole.
+    """
+    writer = _writer(fmt)
+    if isinstance(out, str):
+        with open(out, "wb") as f:
+            for _ in writer(diff, f, changed_only):
+                pass
+    else:
+        for _ in writer(diff, out, changed_only):
+            pass
+
+def stream_export(diff, fmt: str, changed_only: bool = True):
+    """Like export_diff, but returns an iterator of byte chunks for a streamed response.
+
+    Output is handed over every CHECKPOINT_ROWS rows, so the export holds
+    nothing beyond the sheet DiffEngine is currently yielding. The format is
+    checked before anything is produced, so ExportError is raised here rather
+    than mid-stream.
+
+    If the diff fails part way, the iterator re-raises after the output so
+    far, so a streamed download ends broken instead of short. A CSV first
+    gets a last row with status "error"; XLSX and Parquet output stops before
+    the closing parts, so the file does not open at all.
+    """
+    writer = _writer(fmt)
+
+    def generate():
+        sink = _ChunkSink()
+        for _ in writer(diff, sink, changed_only):
+            data = sink.drain()
+            if data:
+                yield data
+        data = sink.drain()
+        if data:
+            yield data
+    return generate()
+
+def _writer(fmt):
+    if fmt == "xlsx":
+        return _write_xlsx
+    if fmt == "csv":
+        return _write_csv
+    if fmt == "parquet":
+        _import_pyarrow()
+        return _write_parquet
+    raise ExportError(f"Unknown export format '{fmt}' (use one of: {', '.join(EXPORT_FORMATS)})")
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that collects output until drained; stands in for a file when streaming."""
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position  # zipfile and pyarrow need positions, never seeks
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class _TextSink:
+    """Lets csv.writer write UTF-8 into a binary stream."""
+    def __init__(self, out):
+        self._out = out
+
+    def write(self, text):
+        self._out.write(text.encode("utf-8"))
+
+def _text(value) -> str:
+    return "" if value is None else str(value)
+
+def _write_csv(diff, out, changed_only):
+    writer = csv.writer(_TextSink(out))
+    writer.writerow(["sheet_a", "sheet_b", "cell", "row", "col", "status", "a", "b"])
+    try:
+        for sheet in diff:
+            data = sheet.get("data") or {"rows": []}
+            names = [sheet.get("name_a") or "", sheet.get("name_b") or ""]
+            if sheet.get("unchanged") and not changed_only:
+                writer.writerow(names + ["", "", "", "identical", _IDENTICAL_NOTE, ""])
+            for n, row in enumerate(data["rows"], 1):
+                r = row["row_index"]
+                for cell in row["cells"]:
+                    if changed_only and not is_change(cell):
+                        continue
+                    writer.writerow(names + [f"{column_letter(cell['col'])}{r}", r, cell["col"] + 1,
+                                             cell["status"], _text(cell["a"]), _text(cell["b"])])
+                if n % CHECKPOINT_ROWS == 0:
+                    yield
+            yield
+    except Exception as e:
+        # Readers that ignore a broken transfer still see the file is incomplete
+        writer.writerow(["", "", "", "", "", "error", f"Export incomplete: {e}", ""])
+        yield
+        raise
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow)", 501)
+    return pyarrow, pyarrow.parquet
+
+def _write_parquet(diff, out, changed_only):
+    pa, pq = _import_pyarrow()
+    schema = pa.schema([
+        ("sheet_a", pa.string()), ("sheet_b", pa.string()), ("cell", pa.string()),
+        ("row", pa.int32()), ("col", pa.int32()), ("status", pa.string()),
+        ("a", pa.string()), ("b", pa.string()),
+    ])
+    columns = {name: [] for name in schema.names}
+
+    def flush():
+        writer.write_batch(pa.record_batch([columns[name] for name in schema.names], schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    writer = pq.ParquetWriter(out, schema)
+    try:
+        for sheet in diff:
+            data = sheet.get("data") or {"rows": []}
+            name_a, name_b = sheet.get("name_a"), sheet.get("name_b")
+            if sheet.get("unchanged") and not changed_only:
+                for name, value in zip(schema.names, (name_a, name_b, None, None, None, "identical", _IDENTICAL_NOTE, "")):
+                    columns[name].append(value)
+            for row in data["rows"]:
+                r = row["row_index"]
+                for cell in row["cells"]:
+                    if changed_only and not is_change(cell):
+                        continue
+                    columns["sheet_a"].append(name_a)
+                    columns["sheet_b"].append(name_b)
+                    columns["cell"].append(f"{column_letter(cell['col'])}{r}")
+                    columns["row"].append(r)
+                    columns["col"].append(cell["col"] + 1)
+                    columns["status"].append(cell["status"])
+                    columns["a"].append(_text(cell["a"]))
+                    columns["b"].append(_text(cell["b"]))
+                if len(columns["cell"]) >= PARQUET_BATCH_CELLS:
+                    flush()
+                    yield
+        if columns["cell"]:
+            flush()
+    finally:
+        writer.close()
+    yield
+
+def _xlsx_text(value) -> str:
+    return escape(_XML_INVALID.sub("", _text(value))[:_MAX_CELL_TEXT])
+
+def _xlsx_cell(cell):
+    """Displayed text and style for one diff cell: modified cells show 'old → new'."""
+    status = cell["status"]
+    if status == "modified":
+        text = f"{_text(cell['a'])} → {_text(cell['b'])}"
+    elif status == "deleted":
+        text = cell["a"]
+    else:
+        text = cell["b"]
+    return text, _XLSX_STYLES.get(status, 0)
+
+def _sheet_title(sheet, used):
+    names = [sheet.get("name_b"), sheet.get("name_a")]
+    name = (next((n for n in names if n and n != _MISSING_SHEET), None)
+            or next((n for n in names if n), "Sheet"))
+    base = _SHEET_TITLE_INVALID.sub("_", name)[:31] or "Sheet"
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+def _write_xlsx(diff, out, changed_only):
+    """Highlighted workbook with one worksheet per diff sheet, written a row at a time.
+
+    Strings are written inline instead of through a shared string table, so
+    nothing accumulates across rows; the workbook parts that list the sheets
+    are written last.
+    """
+    titles = []
+    used = set()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
+        for sheet in diff:
+            titles.append(_sheet_title(sheet, used))
+            data = sheet.get("data") or {"rows": []}
+            with z.open(f"xl/worksheets/sheet{len(titles)}.xml", "w", force_zip64=True) as f:
+                f.write(_WORKSHEET_HEAD)
+                if sheet.get("unchanged"):
+                    f.write(f'<row r="1"><c r="A1" t="inlineStr"><is><t>{_IDENTICAL_NOTE}</t></is></c></row>'.encode())
+                for n, row in enumerate(data["rows"], 1):
+                    r = row["row_index"]
+                    parts = []
+                    for cell in row["cells"]:
+                        text, style = _xlsx_cell(cell)
+                        if not style and _text(text) == "":
+                            continue
+                        style_attr = f' s="{style}"' if style else ""
+                        parts.append(f'<c r="{column_letter(cell["col"])}{r}"{style_attr} t="inlineStr">'
+                                     f'<is><t xml:space="preserve">{_xlsx_text(text)}</t></is></c>')
+                    if parts:
+                        f.write(f'<row r="{r}">{"".join(parts)}</row>'.encode("utf-8"))
+                    if n % CHECKPOINT_ROWS == 0:
+                        yield
+                f.write(b"</sheetData></worksheet>")
+            yield
+
+        if not titles:  # A workbook needs at least one sheet
+            titles.append("Diff")
+            z.writestr("xl/worksheets/sheet1.xml", _WORKSHEET_HEAD + b"</sheetData></worksheet>")
+        z.writestr("[Content_Types].xml", _content_types(len(titles)))
+        z.writestr("_rels/.rels", _ROOT_RELS)
+        z.writestr("xl/workbook.xml", _workbook(titles))
+        z.writestr("xl/_rels/workbook.xml.rels", _workbook_rels(len(titles)))
+        z.writestr("xl/styles.xml", _STYLES)
+    yield
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_WORKSHEET_HEAD = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   f'<worksheet xmlns="{_MAIN_NS}"><sheetData>').encode("utf-8")
+
+_ROOT_RELS = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_PKG_REL_NS}">'
+              f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+
+# Fills: 0 none, 1 gray125 (both required), 2 yellow = modified, 3 green = added, 4 red = deleted
+_STYLES = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="5"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFFFF2CC"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFC6EFCE"/></patternFill></fill>'
+    '<fill><patternFill patternType="solid"><fgColor rgb="FFFFC7CE"/></patternFill></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="2" borderId="0" xfId="0" applyFill="1"/>'
+    '<xf numFmtId="0" fontId="0" fillId="3" borderId="0" xfId="0" applyFill="1"/>'
+    '<xf numFmtId="0" fontId="0" fillId="4" borderId="0" xfId="0" applyFill="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+def _content_types(sheet_count):
+    sheets = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, sheet_count + 1)
+    )
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{sheets}</Types>')
+
+def _workbook(titles):
+    sheets = "".join(f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+                     for i, title in enumerate(titles, 1))
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>')
+
+def _workbook_rels(sheet_count):
+    rels = "".join(f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                   for i in range(1, sheet_count + 1))
+    styles = f'<Relationship Id="rId{sheet_count + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{_PKG_REL_NS}">{rels}{styles}</Relationships>')
@@ -5,6 +5,9 @@ import time
 import stat
 from typing import Optional
 
+# Hides the console window on Windows; creationflags must stay 0 elsewhere
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
 class GitReader:
     @staticmethod
     def _handle_remove_readonly(func, path, excinfo):
@@ -15,7 +18,7 @@ class GitReader:
     @staticmethod
     def fetch_excel(branch: str, path: str, target_dir: str, url: Optional[str] = None) -> str:
         # Define the flag to hide the console window
-        CREATE_NO_WINDOW = 0x08000000 
+        CREATE_NO_WINDOW = _CREATE_NO_WINDOW
 
         normalized_path = path.replace("\\", "/")
         filename = f"[Branch: {branch}] {os.path.basename(normalized_path)}"
@@ -74,7 +77,7 @@ class GitReader:
     @staticmethod
     def fetch_commit_history(branch: str, path: str, url: Optional[str] = None, limit: int = 20) -> list:
         """Fetch commit history for a specific file."""
-        CREATE_NO_WINDOW = 0x08000000
+        CREATE_NO_WINDOW = _CREATE_NO_WINDOW
         normalized_path = path.replace("\\", "/")
         commits = []
         
@@ -156,7 +159,7 @@ class GitReader:
     @staticmethod
     def fetch_excel_by_commit(commit_hash: str, path: str, target_dir: str, url: Optional[str] = None) -> str:
         """Fetch Excel file from a specific commit."""
-        CREATE_NO_WINDOW = 0x08000000
+        CREATE_NO_WINDOW = _CREATE_NO_WINDOW
         normalized_path = path.replace("\\", "/")
         filename = f"[Commit: {commit_hash[:7]}] {os.path.basename(normalized_path)}"
         save_path = os.path.join(target_dir, filename)
@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+# Histogram buckets: seconds for stage timings, plain counts for bytes/cells
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+COUNTER_HELP = {
+    "bytes_fetched": "Bytes of workbook data fetched from Git or uploaded per request.",
+    "cells_parsed": "Worksheet cells parsed per request.",
+    "cells_diffed": "Cells compared by the diff engine per request.",
+    "sheets_skipped": "Sheets found byte-identical and skipped without parsing per request.",
+    "rows_rediffed": "Rows re-diffed by an incremental re-compare per request.",
+    "parse_cache_hits": "Sheets served from the shared parse cache per request.",
+}
+
+class RequestMetrics:
+    """Stage durations and counters collected while serving one request.
+
+    Stages are exclusive: when a stage starts inside another one (e.g. a sheet
+    being parsed lazily while the page renders), the outer stage is paused, so
+    the durations add up to the wall time instead of double counting.
+    """
+    def __init__(self, endpoint: str = None):
+        self.endpoint = endpoint or "unknown"
+        self.stages = {}
+        self.counters = {}
+        self._stack = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            self._pause(self._stack[-1], now)
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._pause(self._stack.pop(), now)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _pause(self, entry, now):
+        name, started = entry
+        self.stages[name] = self.stages.get(name, 0.0) + (now - started)
+
+    def add(self, counter: str, amount: int):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._started
+
+    def server_timing(self) -> str:
+        """Formats the stage durations so far (including a stage still running) as a Server-Timing value."""
+        stages = dict(self.stages)
+        if self._stack:
+            name, started = self._stack[-1]
+            stages[name] = stages.get(name, 0.0) + (time.perf_counter() - started)
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()]
+        parts.append(f"total;dur={self.total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            **self.counters,
+        }
+
+class _NullMetrics:
+    """Stand-in used when the parser or engine runs without instrumentation."""
+    def stage(self, name):
+        return nullcontext()
+
+    def add(self, counter, amount):
+        pass
+
+NULL_METRICS = _NullMetrics()
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Process-wide histograms aggregated from finished requests."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (metric name, sorted labels) -> _Histogram
+        self._help = {}
+
+    def observe(self, name: str, value: float, buckets, help_text: str, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+                self._help[name] = help_text
+            hist.observe(value)
+
+    def record(self, metrics: RequestMetrics):
+        endpoint = metrics.endpoint
+        self.observe("excel_compare_request_seconds", metrics.total_seconds, TIME_BUCKETS,
+                     "Wall time per request.", endpoint=endpoint)
+        for stage, seconds in metrics.stages.items():
+            self.observe("excel_compare_stage_seconds", seconds, TIME_BUCKETS,
+                         "Time spent per pipeline stage.", endpoint=endpoint, stage=stage)
+        for counter, value in metrics.counters.items():
+            self.observe(f"excel_compare_{counter}", value, SIZE_BUCKETS,
+                         COUNTER_HELP.get(counter, counter), endpoint=endpoint)
+
+    def _snapshot(self):
+        """Sorted [((name, labels), histogram)] and {name: help text} to render."""
+        with self._lock:
+            return sorted(self._histograms.items()), dict(self._help)
+
+    def render_prometheus(self) -> str:
+        """Renders every histogram in the Prometheus text exposition format."""
+        items, help_texts = self._snapshot()
+
+        lines = []
+        current = None
+        for (name, labels), hist in items:
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {help_texts[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f"{name}_bucket{_labels(labels, le=_format_bound(bound))} {count}")
+            lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {hist.count}')
+            lines.append(f"{name}_sum{_labels(labels)} {hist.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+class SharedMetricsRegistry(MetricsRegistry):
+    """MetricsRegistry for several worker processes pointed at one folder.
+
+    Each process writes its own histograms to <folder>/worker-<pid>.json after
+    every request, and rendering sums the files of all workers, so a scrape
+    answered by any worker covers the whole deployment. Files of exited
+    workers are kept, so the totals never go backwards; serve.py clears the
+    folder when the server starts.
+    """
+    def __init__(self, folder: str):
+        super().__init__()
+        self.folder = folder
+        self._write_lock = threading.Lock()
+
+    def record(self, metrics: RequestMetrics):
+        super().record(metrics)
+        with self._write_lock:  # Snapshot and write together, so an older snapshot never wins
+            with self._lock:
+                document = {
+                    "help": dict(self._help),
+                    "histograms": [[name, labels, hist.buckets, hist.counts, hist.sum, hist.count]
+                                   for (name, labels), hist in self._histograms.items()],
+                }
+            os.makedirs(self.folder, exist_ok=True)
+            # The pid is read on every write: a registry created before a fork must not share a file
+            path = os.path.join(self.folder, f"worker-{os.getpid()}.json")
+            tmp_path = os.path.join(self.folder, f".worker-{os.getpid()}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(document, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+
+    def _snapshot(self):
+        histograms, help_texts = {}, {}
+        try:
+            entries = sorted(entry.path for entry in os.scandir(self.folder)
+                             if entry.name.startswith("worker-") and entry.name.endswith(".json"))
+        except OSError:
+            entries = []
+        for path in entries:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    document = json.load(f)
+            except (OSError, ValueError):
+                continue
+            help_texts.update(document["help"])
+            for name, labels, buckets, counts, total, count in document["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                hist = histograms.get(key)
+                if hist is None:
+                    hist = histograms[key] = _Histogram(tuple(buckets))
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.sum += total
+                hist.count += count
+        return sorted(histograms.items()), help_texts
+
+def _format_bound(bound):
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
@@ -0,0 +1,87 @@
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+
+class PipelineProfiler:
+    """Profiles one request: cProfile for a pstats dump, plus a stack sampler for flame graphs.
+
+    The sampler only follows the thread that started the profiler. cProfile
+    follows that thread too up to Python 3.11; from 3.12 it runs on
+    sys.monitoring, which is process-wide, so its pstats dump also holds
+    whatever other requests ran meanwhile. Only one cProfile can be active per
+    process, and a second concurrent profiled request falls back to sampling
+    only.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._profile = None
+        self._samples = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._thread_id = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            self._profile = profile
+        except ValueError:
+            self._profile = None  # Another profiler is already active in this process
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self._samples[";".join(reversed(stack))] += 1
+
+    def save(self, folder: str, profile_id: str) -> dict:
+        """Writes <id>.pstats (when cProfile ran) and <id>.collapsed.txt; returns {kind: path}."""
+        os.makedirs(folder, exist_ok=True)
+        paths = {}
+        if self._profile is not None:
+            paths["pstats"] = os.path.join(folder, f"{profile_id}.pstats")
+            self._profile.dump_stats(paths["pstats"])
+        paths["collapsed"] = os.path.join(folder, f"{profile_id}.collapsed.txt")
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return paths
+
+def prune_profiles(folder: str, keep: int):
+    """Removes all but the keep most recently written profiles (all files of one id go together)."""
+    newest = {}
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        profile_id = entry.name.split(".", 1)[0]
+        newest[profile_id] = max(mtime, newest.get(profile_id, mtime))
+    stale = set(sorted(newest, key=newest.get, reverse=True)[keep:])
+    for entry in entries:
+        if entry.name.split(".", 1)[0] in stale:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.metrics import NULL_METRICS
+
+def _row_hash(row) -> bytes:
+    return hashlib.blake2b("\x1f".join(str(v) for v in row).encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+class CompareSession:
+    """Re-compares new uploads of a local file against one fixed commit version.
+
+    The commit side is parsed once and kept, together with a fingerprint of
+    every row of the last local upload. On the next upload only rows whose
+    fingerprint changed are re-diffed and patched into the stored diff in
+    place. A sheet whose size changes is re-diffed whole, and a different set
+    of sheets means a full comparison.
+    """
+    def __init__(self, key, commit_sheets, commit_side: str = "a"):
+        self.key = key
+        self.commit_side = commit_side
+        # Materialized once: lazily parsed sheets would be re-read from a deleted temp file
+        self.commit_sheets = {name: rows for name, rows in commit_sheets.items()}
+        self.result_id = None
+        self.diff = None
+        self.lock = threading.Lock()
+        self._local_names = None
+        self._row_hashes = {}
+
+    def compare(self, local_sheets, metrics=None) -> list:
+        """Diffs a new local upload and returns the (patched) diff list."""
+        metrics = metrics or NULL_METRICS
+        local = {name: rows for name, rows in local_sheets.items()}
+        hashes = {name: [_row_hash(row) for row in rows] for name, rows in local.items()}
+        names = list(local)
+
+        if self.diff is None or names != self._local_names:
+            self.diff = self._engine(local, metrics).compare()
+        else:
+            engine = self._engine(local, metrics)
+            commit_rows = list(self.commit_sheets.values())
+            with metrics.stage("diff"):
+                for i, name in enumerate(names):
+                    rows_commit = commit_rows[i] if i < len(commit_rows) else []
+                    self._patch_sheet(engine, self.diff[i], rows_commit, local[name],
+                                      self._row_hashes.get(name, []), hashes[name], metrics)
+
+        self._local_names = names
+        self._row_hashes = hashes
+        return self.diff
+
+    def cell_count(self) -> int:
+        """Approximate size: cells of the kept commit workbook plus cells of the stored diff."""
+        commit = sum(len(row) for rows in self.commit_sheets.values() for row in rows)
+        diff = sum(len(sheet["data"]["rows"]) * sheet["data"]["max_cols"] for sheet in self.diff or ())
+        return commit + diff
+
+    def _engine(self, local, metrics):
+        if self.commit_side == "a":
+            return DiffEngine(self.commit_sheets, local, metrics=metrics)
+        return DiffEngine(local, self.commit_sheets, metrics=metrics)
+
+    def _patch_sheet(self, engine, sheet, rows_commit, rows_local, old_hashes, new_hashes, metrics):
+        rows_a, rows_b = (rows_commit, rows_local) if self.commit_side == "a" else (rows_local, rows_commit)
+        offsets = rows_a if hasattr(rows_a, "row_offset") else rows_b
+        row_offset = getattr(offsets, "row_offset", 0)
+        col_offset = getattr(offsets, "col_offset", 0)
+
+        max_rows = max(len(rows_a), len(rows_b))
+        max_cols = max(max((len(r) for r in rows_a), default=0), max((len(r) for r in rows_b), default=0))
+        data = sheet["data"]
+        if sheet.get("unchanged") or data["max_cols"] != max_cols or len(data["rows"]) != max_rows:
+            # Every row's cell list depends on max_cols, so a resized sheet is re-diffed whole
+            sheet.pop("unchanged", None)
+            sheet["data"] = engine._compare_sheet(rows_a, rows_b, row_offset, col_offset)
+            metrics.add("rows_rediffed", max_rows)
+            return
+
+        rediffed = 0
+        for r in range(max(len(old_hashes), len(new_hashes))):
+            old = old_hashes[r] if r < len(old_hashes) else None
+            new = new_hashes[r] if r < len(new_hashes) else None
+            if old == new:
+                continue
+            row_a = rows_a[r] if r < len(rows_a) else []
+            row_b = rows_b[r] if r < len(rows_b) else []
+            data["rows"][r] = engine._compare_row(row_a, row_b, r, max_cols, row_offset, col_offset)
+            rediffed += 1
+        metrics.add("rows_rediffed", rediffed)
+
+class SessionStore:
+    """The CompareSessions of one process, bounded by count, total cells and idle time.
+
+    A session holds a whole commit workbook and a cell-level diff, so the
+    least recently used ones are dropped once the cells of all sessions pass
+    max_cells; a session bigger than that on its own is not kept at all.
+    Thread-safe: the threaded servers of serve.py share one store per worker.
+    """
+    def __init__(self, max_sessions: int = 20, max_cells: int = 5_000_000, idle_seconds: int = 1800):
+        self.max_sessions = max_sessions
+        self.max_cells = max_cells
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()  # session id -> [session, cells, last used], oldest first
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            entry[2] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def add(self, session: CompareSession) -> str:
+        """Stores a new session (its size is set by update once it has compared); returns its id."""
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions[session_id] = [session, 0, time.monotonic()]
+            self._evict()
+        return session_id
+
+    def update(self, session_id):
+        """Re-measures a session after a compare and evicts others (or it) to stay within max_cells."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+        cells = entry[0].cell_count()  # Outside the store lock: the caller holds the session's lock
+        with self._lock:
+            if self._sessions.get(session_id) is entry:
+                entry[1] = cells
+                self._evict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id in [sid for sid, entry in self._sessions.items() if entry[2] < cutoff]:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self):
+        self._expire()
+        total = sum(entry[1] for entry in self._sessions.values())
+        while self._sessions and (len(self._sessions) > self.max_sessions or total > self.max_cells):
+            _, entry = self._sessions.popitem(last=False)
+            total -= entry[1]
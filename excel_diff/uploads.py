@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+_COPY_BLOCK = 1024 * 1024
+
+class UploadError(Exception):
+    """Unknown, incomplete or rejected chunked upload.
+
+    status is the HTTP code to answer with; offset, when known, is where the
+    client should resume.
+    """
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+class ChunkedUploadStore:
+    """Spools workbooks uploaded in chunks to disk until a comparison claims them.
+
+    Every upload is <id>.part, holding the bytes received so far (its size is
+    the resume offset), and <id>.json with the filename, the declared size and
+    an optional sha256 of the whole file. Chunks must be sent in order; a chunk
+    that fails its X-Chunk-Sha256 check or is cut off is discarded so the
+    client can resend it from the same offset.
+
+    Writes and claims hold an OS file lock on <id>.lock, so two requests for
+    one upload are serialized even when different worker processes serve them.
+    """
+    def __init__(self, folder: str, max_size: int, expire_seconds: int = 24 * 3600):
+        self.folder = folder
+        self.max_size = max_size
+        self.expire_seconds = expire_seconds
+
+    def create(self, filename: str, size: int, sha256: str = None) -> dict:
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("File size must be a positive integer")
+        if size > self.max_size:
+            raise UploadError(f"File is too large (limit {self.max_size // (1024 * 1024)}MB)", 413)
+        if sha256 and not _SHA256.match(sha256):
+            raise UploadError("sha256 must be 64 hex characters")
+
+        os.makedirs(self.folder, exist_ok=True)
+        self._purge_expired()
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, "wb").close()
+        meta = {"filename": os.path.basename(filename), "size": size,
+                "sha256": sha256.lower() if sha256 else None, "complete": False}
+        self._write_meta(meta_path, meta)
+        return self._state(upload_id, meta, 0)
+
+    def status(self, upload_id: str) -> dict:
+        meta = self._read_meta(upload_id)
+        part_path, _ = self._paths(upload_id)
+        return self._state(upload_id, meta, os.path.getsize(part_path))
+
+    def write_chunk(self, upload_id: str, offset: int, stream, sha256: str = None) -> dict:
+        """Appends the chunk read from stream at offset; returns the new upload state."""
+        self._read_meta(upload_id)
+        part_path, meta_path = self._paths(upload_id)
+        with self._lock(upload_id):
+            meta = self._read_meta(upload_id)  # Re-read under the lock: another worker may have finished it
+            current = os.path.getsize(part_path)
+            if meta["complete"]:
+                raise UploadError("Upload is already complete", 409, current)
+            if offset != current:
+                raise UploadError(f"Expected offset {current}", 409, current)
+
+            digest = hashlib.sha256()
+            written = 0
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                try:
+                    while True:
+                        block = stream.read(_COPY_BLOCK)
+                        if not block:
+                            break
+                        written += len(block)
+                        if offset + written > meta["size"]:
+                            raise UploadError("Chunk goes past the declared file size", 400, offset)
+                        digest.update(block)
+                        f.write(block)
+                    if sha256 and digest.hexdigest() != sha256.lower():
+                        raise UploadError("Chunk checksum mismatch", 422, offset)
+                except BaseException:
+                    f.truncate(offset)
+                    raise
+
+            current = offset + written
+            if current == meta["size"]:
+                if meta["sha256"] and self._file_sha256(part_path) != meta["sha256"]:
+                    # No way to tell which chunk was bad: start over
+                    open(part_path, "wb").close()
+                    raise UploadError("File checksum mismatch, upload restarted", 422, 0)
+                meta["complete"] = True
+                self._write_meta(meta_path, meta)
+        return self._state(upload_id, meta, current)
+
+    def claim(self, upload_id: str, target_path: str) -> dict:
+        """Moves a complete upload to target_path (it can only be claimed once); returns its metadata."""
+        self._read_meta(upload_id)
+        part_path, meta_path = self._paths(upload_id)
+        with self._lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if not meta["complete"]:
+                raise UploadError("Upload is not complete", 409, os.path.getsize(part_path))
+            shutil.move(part_path, target_path)
+            os.remove(meta_path)
+        self._remove_lock_file(upload_id)
+        return meta
+
+    def discard(self, upload_id: str):
+        self._read_meta(upload_id)
+        with self._lock(upload_id):
+            for path in self._paths(upload_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._remove_lock_file(upload_id)
+
+    def _state(self, upload_id, meta, offset):
+        return {"upload_id": upload_id, "filename": meta["filename"], "size": meta["size"],
+                "offset": offset, "complete": meta["complete"]}
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.folder, upload_id)
+        return base + ".part", base + ".json"
+
+    @contextmanager
+    def _lock(self, upload_id):
+        """Exclusive lock shared by threads and processes; the OS drops it if a worker dies holding it."""
+        # Every caller opens its own handle: flock/msvcrt locks belong to the handle, not the process
+        with open(os.path.join(self.folder, upload_id + ".lock"), "a+b") as f:
+            if os.name == "nt":
+                f.seek(0)
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Retries for about 10 seconds
+                except OSError:
+                    raise UploadError("Upload is busy, retry the chunk", 409)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _remove_lock_file(self, upload_id):
+        try:
+            os.remove(os.path.join(self.folder, upload_id + ".lock"))
+        except OSError:
+            pass  # Still held elsewhere (Windows) or already gone; _purge_expired removes it later
+
+    def _read_meta(self, upload_id):
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise UploadError("Unknown upload", 404)
+        try:
+            with open(self._paths(upload_id)[1], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadError("Unknown upload", 404)
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def _file_sha256(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_COPY_BLOCK), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.expire_seconds
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
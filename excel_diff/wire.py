@@ -0,0 +1,155 @@
+import zlib
+
+# Compact diff encoding ("compact-v1")
+#
+# Every sheet keeps its name_a/name_b/is_match/unchanged keys, gains a "strings"
+# list and has its data replaced by:
+#   {"max_cols", "col_offset", "row_start", "rows": [[op, ...], ...]}
+# "strings" only holds the values first used by that sheet; they are appended to
+# one table shared by the whole response, so sheets can be streamed one by one.
+# Rows are consecutive from row_start. Each row is a flat list of ops:
+#   0, n             n equal blank cells
+#   1, n, s1..sn     n equal cells whose A and B values are identical
+#   2|3|4|5, sa, sb  one modified | added | deleted | equal (differing raw values) cell
+# Blank cells after the last op are implied up to max_cols.
+ENCODING = "compact-v1"
+
+BLANK_RUN = 0
+EQUAL_RUN = 1
+PAIR_STATUS = {"modified": 2, "added": 3, "deleted": 4, "equal": 5}
+STATUS_NAMES = {code: status for status, code in PAIR_STATUS.items()}
+
+class CompactEncoder:
+    """Encodes the diff sheets of one response, sharing a single string table."""
+    def __init__(self):
+        self._index = {}
+
+    def _intern(self, value, new_strings):
+        key = (value.__class__, value)  # keep 1, 1.0, True and "1" apart
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self._index)
+            new_strings.append(value)
+        return index
+
+    def encode_sheet(self, sheet: dict) -> dict:
+        encoded = {key: value for key, value in sheet.items() if key != "data"}
+        new_strings = []
+        data = sheet.get("data")
+        if data is not None:
+            rows = data["rows"]
+            encoded["data"] = {
+                "max_cols": data["max_cols"],
+                "col_offset": data.get("col_offset", 0),
+                "row_start": rows[0]["row_index"] if rows else 1,
+                "rows": [self._encode_row(row["cells"], new_strings) for row in rows],
+            }
+        encoded["strings"] = new_strings
+        return encoded
+
+    def _encode_row(self, cells, new_strings):
+        ops = []
+        run_kind = None
+        run = []  # blank run: cell count in run[0]; equal run: string indexes
+        for cell in cells:
+            a, b, status = cell["a"], cell["b"], cell["status"]
+            if status == "equal" and a == b and a.__class__ is b.__class__:
+                kind = BLANK_RUN if a == "" else EQUAL_RUN
+                if kind != run_kind:
+                    self._flush(ops, run_kind, run)
+                    run_kind, run = kind, [0] if kind == BLANK_RUN else []
+                if kind == BLANK_RUN:
+                    run[0] += 1
+                else:
+                    run.append(self._intern(a, new_strings))
+            else:
+                self._flush(ops, run_kind, run)
+                run_kind, run = None, []
+                ops += (PAIR_STATUS[status], self._intern(a, new_strings), self._intern(b, new_strings))
+        if run_kind != BLANK_RUN:
+            self._flush(ops, run_kind, run)
+        return ops
+
+    @staticmethod
+    def _flush(ops, run_kind, run):
+        if run_kind == BLANK_RUN:
+            ops += (BLANK_RUN, run[0])
+        elif run_kind == EQUAL_RUN:
+            ops += (EQUAL_RUN, len(run), *run)
+
+class CompactDecoder:
+    """Turns compact sheets back into the diff format the templates render."""
+    def __init__(self):
+        self.strings = []
+
+    def decode_sheet(self, sheet: dict) -> dict:
+        self.strings.extend(sheet.get("strings", ()))
+        decoded = {key: value for key, value in sheet.items() if key not in ("data", "strings")}
+        data = sheet.get("data")
+        if data is not None:
+            max_cols, col_offset = data["max_cols"], data.get("col_offset", 0)
+            decoded["data"] = {
+                "max_cols": max_cols,
+                "col_offset": col_offset,
+                "rows": [
+                    {"row_index": data["row_start"] + r, "cells": self._decode_row(ops, max_cols, col_offset)}
+                    for r, ops in enumerate(data["rows"])
+                ],
+            }
+        return decoded
+
+    def _decode_row(self, ops, max_cols, col_offset):
+        strings = self.strings
+        cells = []
+        col = col_offset
+        i = 0
+        while i < len(ops):
+            op = ops[i]
+            if op == BLANK_RUN:
+                values, i = [""] * ops[i + 1], i + 2
+            elif op == EQUAL_RUN:
+                count = ops[i + 1]
+                values, i = [strings[s] for s in ops[i + 2:i + 2 + count]], i + 2 + count
+            else:
+                cells.append({"col": col, "a": strings[ops[i + 1]], "b": strings[ops[i + 2]], "status": STATUS_NAMES[op]})
+                col += 1
+                i += 3
+                continue
+            for value in values:
+                cells.append({"col": col, "a": value, "b": value, "status": "equal"})
+                col += 1
+        for col in range(col, max_cols + col_offset):
+            cells.append({"col": col, "a": "", "b": "", "status": "equal"})
+        return cells
+
+def decode_diff(sheets) -> list:
+    """Decodes a complete list of compact sheets."""
+    decoder = CompactDecoder()
+    return [decoder.decode_sheet(sheet) for sheet in sheets]
+
+def gzip_stream(chunks, level: int = 6, flush_size: int = 32 * 1024):
+    """Gzips a streamed body, flushing every flush_size input bytes so the client still receives it incrementally.
+
+    Flushing after every chunk would defeat compression for templates, which
+    stream in many tiny pieces.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            out = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= flush_size:
+                out += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+            if out:
+                yield out
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
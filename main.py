@@ -2,47 +2,108 @@ import subprocess
 import sys
 import importlib.util
 import os
+import json
 import logging
+import socket
+import threading
+import time
 
 REQUIRED_PACKAGES = ["flask", "pywebview", "xlrd"]
+HOST = "127.0.0.1"
+PORT = 5000
 
-def install_and_launch():
+# Written after the first successful dependency check so later launches can skip it
+DEPS_MARKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".deps_ok")
+
+SPLASH_HTML = """
+<html><body style="font-family: Segoe UI, sans-serif; display:flex; align-items:center;
+justify-content:center; height:100vh; margin:0; background:#f0f2f5; color:#217346;">
+<div style="text-align:center;"><h2>Excel Comparison Tool</h2><p>Starting up...</p></div>
+</body></html>
+"""
+
+def _deps_fingerprint():
+    return {"python": sys.executable, "version": sys.version, "packages": REQUIRED_PACKAGES}
+
+def deps_cached() -> bool:
+    try:
+        with open(DEPS_MARKER, "r") as f:
+            return json.load(f) == _deps_fingerprint()
+    except (OSError, ValueError):
+        return False
+
+def ensure_dependencies(force: bool = False):
+    if not force and deps_cached():
+        return
     for package in REQUIRED_PACKAGES:
         search_name = "webview" if package == "pywebview" else package
         if importlib.util.find_spec(search_name) is None:
             print(f"[*] Setting up internal tool: Installing {package}...")
             subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+    try:
+        with open(DEPS_MARKER, "w") as f:
+            json.dump(_deps_fingerprint(), f)
+    except OSError:
+        pass  # Read-only install folder: just check again next launch
+
+def _wait_for_port(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Backend did not start on {host}:{port}")
+
+def start_backend(window):
+    """Runs after the window is shown: imports Flask and the app, starts the server, then swaps in the UI."""
+    try:
+        from app import app
+
+        def run_flask():
+            app.run(host=HOST, port=PORT, debug=False, use_reloader=False)
+
+        t = threading.Thread(target=run_flask)
+        t.daemon = True
+        t.start()
+
+        _wait_for_port(HOST, PORT)
+        print("[+] System Ready.")
+        window.load_url(f"http://{HOST}:{PORT}")
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Backend startup failed: {e}")
+        window.load_html(f"<html><body><h3>Could not start the comparison backend</h3><p>{e}</p></body></html>")
+
+def install_and_launch():
+    ensure_dependencies()
 
     os.environ['WERKZEUG_RUN_MAIN'] = 'true'
     log = logging.getLogger('werkzeug')
     log.setLevel(logging.ERROR)
 
-    import webview
-    from app import app 
-    import threading
-
-    def run_flask():
-        app.run(port=5000, debug=False, use_reloader=False)
+    try:
+        import webview
+    except ImportError:
+        # The cached check is stale (package removed since); redo it once
+        ensure_dependencies(force=True)
+        import webview
 
-    print("[+] System Ready. Launching Excel Comparison Tool...")
-    
-    t = threading.Thread(target=run_flask)
-    t.daemon = True
-    t.start()
+    print("[+] Launching Excel Comparison Tool...")
 
     window = webview.create_window(
-        'Excel Comparison Tool', 
-        'http://127.0.0.1:5000', 
-        width=1300, 
+        'Excel Comparison Tool',
+        html=SPLASH_HTML,
+        width=1300,
         height=800,
         text_select=True
     )
-    webview.start()
+    webview.start(start_backend, window)
 
 if __name__ == "__main__":
     try:
-        
+
         install_and_launch()
     except Exception as e:
         print(f"\n[!] Error: {e}")
-        input("Press Enter to close...")
\ No newline at end of file
+        input("Press Enter to close...")
@@ -0,0 +1,98 @@
+"""Production server for the shared deployment: several worker processes behind a WSGI server.
+
+    python serve.py --workers 4 --threads 4 --port 8000
+
+gunicorn (Linux/macOS) runs the worker processes. waitress is the fallback on
+Windows, where it serves a single process with --threads threads. --server dev
+runs Flask's development server for comparison. main.py and the desktop app
+are unaffected.
+
+Comparison results, parsed sheets and the /metrics histograms live under
+--state-folder so every worker can serve them; all workers share one session
+secret key.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import secrets
+import shutil
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def _default_workers():
+    return int(os.environ.get("EXCEL_COMPARE_WORKERS") or min(2 * (os.cpu_count() or 1) + 1, 8))
+
+def _pick_server(name):
+    if name != "auto":
+        return name
+    if os.name != "nt" and importlib.util.find_spec("gunicorn"):
+        return "gunicorn"
+    if importlib.util.find_spec("waitress"):
+        return "waitress"
+    raise SystemExit("[!] No production WSGI server found: pip install gunicorn (Linux/macOS) or waitress (Windows)")
+
+def configure_shared_state(state_folder):
+    """Points the app at process-shared storage; must run before the app is imported."""
+    os.environ.setdefault("EXCEL_COMPARE_RESULT_STORE", os.path.join(state_folder, "results"))
+    os.environ.setdefault("EXCEL_COMPARE_PARSE_CACHE", os.path.join(state_folder, "parse_cache"))
+    os.environ.setdefault("EXCEL_COMPARE_SECRET_KEY", secrets.token_hex(32))
+    # Histograms restart with the server, like the in-process registry of a single worker
+    metrics_folder = os.environ.setdefault("EXCEL_COMPARE_METRICS_FOLDER", os.path.join(state_folder, "metrics"))
+    shutil.rmtree(metrics_folder, ignore_errors=True)
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ExcelCompareApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("timeout", args.timeout)
+
+        def load(self):
+            from app import app
+            return app
+
+    ExcelCompareApplication().run()
+
+def run_waitress(args):
+    from waitress import serve
+    from app import app
+    if args.workers > 1:
+        print("[!] waitress runs a single process; --workers is ignored, use --threads")
+    serve(app, host=args.host, port=args.port, threads=args.threads, channel_timeout=args.timeout)
+
+def run_dev(args):
+    from app import app
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # As in main.py: keep request lines out of the error log
+    app.run(host=args.host, port=args.port, debug=False, use_reloader=False, threaded=args.threads > 1)
+
+SERVERS = {"gunicorn": run_gunicorn, "waitress": run_waitress, "dev": run_dev}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Excel comparison service with multiple workers.")
+    parser.add_argument("--host", default=os.environ.get("EXCEL_COMPARE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("EXCEL_COMPARE_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=_default_workers())
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("EXCEL_COMPARE_THREADS", 4)))
+    parser.add_argument("--timeout", type=int, default=300, help="Seconds before a stuck request/worker is dropped")
+    parser.add_argument("--server", choices=["auto", *SERVERS], default="auto")
+    parser.add_argument("--state-folder", default=os.path.join(PROJECT_ROOT, "shared_state"),
+                        help="Results and parse cache shared by all workers")
+    args = parser.parse_args(argv)
+
+    server = _pick_server(args.server)
+    configure_shared_state(os.path.abspath(args.state_folder))
+    # Any client could otherwise have its requests profiled and written to disk
+    os.environ.setdefault("EXCEL_COMPARE_PROFILE_OPT_IN", "0")
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    print(f"[+] Serving on {args.host}:{args.port} with {server} ({args.workers} workers x {args.threads} threads)")
+    SERVERS[server](args)
+
+if __name__ == "__main__":
+    main()
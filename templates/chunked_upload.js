@@ -0,0 +1,60 @@
+// Chunked, resumable upload for workbooks too large for one request (see /api/uploads in app.py).
+// Included into the page scripts of excel_diff.html and excel_diff_result.html.
+const CHUNKED_UPLOAD_THRESHOLD = 4 * 1024 * 1024;
+const CHUNKED_UPLOAD_RETRIES = 5;
+
+async function sha256Hex(blob) {
+    // crypto.subtle only exists in secure contexts (https or localhost); the checksum is optional
+    if (!window.crypto || !crypto.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadInChunks(file, onProgress) {
+    const created = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size})
+    }).then(r => r.json());
+    if (created.error) throw new Error(created.error);
+
+    const uploadId = created.upload_id;
+    let offset = created.offset;
+    let failures = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + created.chunk_size);
+        const headers = {'Content-Type': 'application/octet-stream'};
+        const checksum = await sha256Hex(chunk);
+        if (checksum) headers['X-Chunk-Sha256'] = checksum;
+        try {
+            const r = await fetch(`/api/uploads/${uploadId}?offset=${offset}`, {method: 'PUT', headers: headers, body: chunk});
+            // Decided on the status first: a proxy's 413/404 page is not JSON
+            const data = await r.json().catch(() => ({}));
+            if (!r.ok) {
+                const error = new Error(data.error || ('HTTP ' + r.status));
+                error.fatal = r.status === 404 || r.status === 413;  // unknown upload / too large: retrying won't help
+                throw error;
+            }
+            offset = data.offset;
+            failures = 0;
+        } catch (e) {
+            if (e.fatal || ++failures > CHUNKED_UPLOAD_RETRIES) throw e;
+            await new Promise(resolve => setTimeout(resolve, 500 * failures));
+            // Resume from whatever the server actually kept
+            const state = await fetch(`/api/uploads/${uploadId}`).then(r => r.json()).catch(() => null);
+            if (state && state.error) throw new Error(state.error);
+            if (state) offset = state.offset;
+        }
+        if (onProgress) onProgress(offset / file.size);
+    }
+    return uploadId;
+}
+
+// Appends a workbook to a FormData: small files as fileField, large ones as a chunked upload id in uploadIdField
+async function appendWorkbook(formData, fileField, uploadIdField, file, onProgress) {
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        formData.append(uploadIdField, await uploadInChunks(file, onProgress));
+    } else {
+        formData.append(fileField, file);
+    }
+}
@@ -0,0 +1,112 @@
+import csv
+import importlib.util
+import io
+import os
+import zipfile
+
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.excel_parser import ExcelParser
+from excel_diff.export import export_diff, is_change, stream_export
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_files")
+# Fill colours of the exported styles, by diff status
+FILLS = {"modified": "FFFFF2CC", "added": "FFC6EFCE", "deleted": "FFFFC7CE"}
+
+def _diff(name_a="test1_excel.xlsx", name_b="test2_excel.xlsx", **kwargs):
+    return DiffEngine(ExcelParser(os.path.join(TEST_FILES, name_a)).parse(),
+                      ExcelParser(os.path.join(TEST_FILES, name_b)).parse(), **kwargs).compare()
+
+def _export(diff, fmt, **kwargs):
+    out = io.BytesIO()
+    export_diff(diff, fmt, out, **kwargs)
+    return out.getvalue()
+
+def _csv_rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+def _failing(diff):
+    yield diff[0]
+    raise ValueError("sheet 2 broke")
+
+def test_xlsx_fills_and_titles():
+    if importlib.util.find_spec("openpyxl") is None:
+        return  # Only checked where openpyxl is installed
+    import openpyxl
+    diff = _diff()
+    # test2 lacks the last sheet (named "MISSING" in the diff), and two pairs map to "Sheet3"
+    assert [(s["name_a"], s["name_b"]) for s in diff][-2:] == [("Sheet4", "Sheet3"), ("Sheet3", "MISSING")]
+    workbook = openpyxl.load_workbook(io.BytesIO(_export(diff, "xlsx")))
+    assert workbook.sheetnames == ["Sheet1", "Sheet2", "Sheet3", "Sheet3 (2)"]
+    for sheet, worksheet in zip(diff, workbook):
+        for row in sheet["data"]["rows"]:
+            for cell in row["cells"]:
+                exported = worksheet.cell(row=row["row_index"], column=cell["col"] + 1)
+                if cell["status"] in FILLS and is_change(cell):
+                    assert exported.fill.fgColor.rgb == FILLS[cell["status"]]
+                elif cell["status"] == "equal":
+                    assert exported.fill.fill_type is None
+                if cell["status"] == "modified":
+                    assert exported.value == f"{cell['a']} → {cell['b']}"
+
+def test_identical_sheets_are_exported_whole():
+    if importlib.util.find_spec("openpyxl") is None:
+        return
+    import openpyxl
+    workbook = openpyxl.load_workbook(io.BytesIO(_export(_diff(name_b="test1_excel.xlsx", skip_identical=False), "xlsx")))
+    assert [ws.max_row for ws in workbook][:3] == [20, 2, 24]
+    skipped = openpyxl.load_workbook(io.BytesIO(_export(_diff(name_b="test1_excel.xlsx"), "xlsx")))
+    assert all(ws["A1"].value.startswith("Identical") for ws in skipped)
+
+def test_csv_rows_match_changes():
+    diff = _diff()
+    expected = [(s["name_a"], s["name_b"], r["row_index"], c["col"] + 1, c["status"])
+                for s in diff for r in s["data"]["rows"] for c in r["cells"] if is_change(c)]
+    rows = _csv_rows(_export(diff, "csv"))
+    assert [(r["sheet_a"], r["sheet_b"], int(r["row"]), int(r["col"]), r["status"]) for r in rows] == expected
+    everything = _csv_rows(_export(diff, "csv", changed_only=False))
+    assert len(everything) == sum(len(r["cells"]) for s in diff for r in s["data"]["rows"])
+
+def test_streamed_output_equals_file_output():
+    diff = _diff()
+    assert b"".join(stream_export(diff, "csv")) == _export(diff, "csv")
+    # Zip headers differ (timestamps, data descriptors when streaming), the parts must not
+    streamed = zipfile.ZipFile(io.BytesIO(b"".join(stream_export(diff, "xlsx"))))
+    written = zipfile.ZipFile(io.BytesIO(_export(diff, "xlsx")))
+    assert streamed.namelist() == written.namelist()
+    assert all(streamed.read(name) == written.read(name) for name in written.namelist())
+
+def test_parquet_round_trip():
+    if importlib.util.find_spec("pyarrow") is None:
+        return  # pyarrow is an optional dependency
+    import pyarrow.parquet as pq
+    diff = _diff()
+    table = pq.read_table(io.BytesIO(_export(diff, "parquet"))).to_pylist()
+    assert table == [{key: row[key] if key in ("sheet_a", "sheet_b", "cell", "status", "a", "b") else int(row[key])
+                      for key in row} for row in _csv_rows(_export(diff, "csv"))]
+
+def test_failed_diff_breaks_the_export():
+    diff = _diff()
+    for fmt in ("csv", "xlsx"):
+        chunks = []
+        try:
+            for chunk in stream_export(_failing(diff), fmt):
+                chunks.append(chunk)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("the failure was swallowed")
+        data = b"".join(chunks)
+        if fmt == "csv":
+            assert _csv_rows(data)[-1]["status"] == "error"
+        else:
+            try:
+                zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                continue
+            raise AssertionError("a partial XLSX must not open")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
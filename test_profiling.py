@@ -0,0 +1,36 @@
+import os
+import tempfile
+import time
+
+from excel_diff.profiling import PipelineProfiler, prune_profiles
+
+def _profile(folder, profile_id, age):
+    profiler = PipelineProfiler()
+    profiler.start()
+    profiler.stop()
+    paths = profiler.save(folder, profile_id)
+    stamp = time.time() - age
+    for path in paths.values():
+        os.utime(path, (stamp, stamp))
+    return paths
+
+def test_prune_keeps_the_newest_profiles():
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(5):
+            _profile(folder, f"profile{i}", age=100 - i)  # profile4 is the newest
+        prune_profiles(folder, keep=2)
+        left = {name.split(".", 1)[0] for name in os.listdir(folder)}
+        assert left == {"profile3", "profile4"}
+        # Every file of a kept profile survives, pstats included
+        assert len(os.listdir(folder)) == 2 * len(_profile(folder, "profile5", age=0))
+        prune_profiles(folder, keep=0)
+        assert os.listdir(folder) == []
+
+def test_prune_tolerates_a_missing_folder():
+    prune_profiles(os.path.join(tempfile.gettempdir(), "no-such-profiles-folder"), keep=1)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
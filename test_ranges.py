@@ -0,0 +1,56 @@
+import os
+
+from excel_diff.excel_parser import ExcelParser, ExcelParserError, parse_cell_range, parse_range_specs
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_files")
+
+def _rejects(text):
+    try:
+        parse_cell_range(text)
+    except ExcelParserError:
+        return True
+    return False
+
+def test_cell_ranges():
+    assert parse_cell_range("A1:Z5000") == (0, 0, 4999, 25)
+    assert parse_cell_range("B2") == (1, 1, 1, 1)
+    assert parse_cell_range("$C$3:$a$1") == (0, 0, 2, 2)  # Corners in any order, $ and case ignored
+    assert parse_cell_range("C:F") == (0, 2, None, 5)
+    assert parse_cell_range("10:200") == (9, 0, 199, None)
+    assert parse_cell_range("AA10") == (9, 26, 9, 26)
+
+def test_invalid_cell_ranges():
+    for text in ["", ":", "A1:", ":B5", "A0", "1A", "A1:B2:C3", "A1-B2"]:
+        assert _rejects(text), text
+
+def test_range_specs():
+    specs = parse_range_specs(["A1:B2", " Data!C:C ", "'It''s'!5:6", ""])
+    assert specs == {None: (0, 0, 1, 1), "Data": (0, 2, None, 2), "It's": (4, 0, 5, None)}
+    assert parse_range_specs(None) == {}
+
+def test_parser_reads_only_the_range():
+    sheets = ExcelParser(os.path.join(TEST_FILES, "test1_excel.xlsx")).parse(ranges=parse_range_specs(["B2:C3"]))
+    for rows in sheets.values():
+        assert (rows.row_offset, rows.col_offset) == (1, 1)
+        assert len(rows) <= 2 and all(len(row) <= 2 for row in rows)
+
+def _parse_error(**selection):
+    try:
+        ExcelParser(os.path.join(TEST_FILES, "test1_excel.xlsx")).parse(**selection)
+    except ExcelParserError as e:
+        return str(e)
+    return None
+
+def test_unknown_sheets_are_rejected():
+    # A typo must not come back as an empty, "no changes" diff
+    error = _parse_error(sheets=["Sheet1", "Shet2"])
+    assert "'Shet2'" in error and "Available sheets: Sheet1, Sheet2, Sheet4, Sheet3" in error
+    error = _parse_error(ranges=parse_range_specs(["Summry!A1:B5"]))
+    assert "'Summry'" in error and "Sheet1" in error
+    assert _parse_error(sheets=["Sheet2"], ranges=parse_range_specs(["Sheet2!A1:B2", "C3"])) is None
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
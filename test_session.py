@@ -0,0 +1,112 @@
+import copy
+import random
+import threading
+import time
+
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.metrics import RequestMetrics
+from excel_diff.session import CompareSession, SessionStore
+
+def _workbook(seed, rows=40, cols=6):
+    rng = random.Random(seed)
+    return {
+        "Summary": [[f"s{r}-{c}" for c in range(cols)] for r in range(rows)],
+        "Data": [[str(rng.randint(0, 9)) for _ in range(cols)] for _ in range(rows)],
+    }
+
+def _edit(workbook, seed, count=5):
+    """Copy of workbook with a few cells changed, sizes untouched."""
+    rng = random.Random(seed)
+    edited = copy.deepcopy(workbook)
+    for _ in range(count):
+        rows = edited[rng.choice(list(edited))]
+        r = rng.randrange(len(rows))
+        rows[r][rng.randrange(len(rows[r]))] = f"edit{seed}"
+    return edited
+
+def _full(commit, local, commit_side):
+    a, b = (commit, local) if commit_side == "a" else (local, commit)
+    return DiffEngine(a, b).compare()
+
+def test_patched_session_matches_full_compare():
+    commit = _workbook(1)
+    for commit_side in ("a", "b"):
+        session = CompareSession("key", commit, commit_side=commit_side)
+        local = _edit(commit, 2)
+        assert session.compare(local) == _full(commit, local, commit_side)
+        for seed in range(3, 8):  # Re-uploads are patched in place
+            local = _edit(local, seed)
+            assert session.compare(local) == _full(commit, local, commit_side)
+
+def test_only_changed_rows_are_rediffed():
+    commit = _workbook(1)
+    session = CompareSession("key", commit)
+    local = _edit(commit, 2)
+    session.compare(local)
+    local = copy.deepcopy(local)
+    local["Data"][7][0] = "changed"
+    local["Data"][30][5] = "changed"
+    metrics = RequestMetrics()
+    assert session.compare(local, metrics=metrics) == _full(commit, local, "a")
+    assert metrics.counters["rows_rediffed"] == 2
+
+def test_resized_and_renamed_sheets():
+    commit = _workbook(1)
+    session = CompareSession("key", commit)
+    session.compare(_edit(commit, 2))
+    local = _edit(commit, 3)
+    local["Data"].append(["new"] * 8)  # More rows and columns: the sheet is re-diffed whole
+    assert session.compare(local) == _full(commit, local, "a")
+    local = {"Renamed": local["Summary"], "Data": local["Data"]}  # Other sheet names: full comparison
+    assert session.compare(local) == _full(commit, local, "a")
+
+def _stored_session(store, seed):
+    commit = _workbook(seed)  # 2 sheets x 40 rows x 6 cols: 480 cells, 960 once it holds a diff
+    session = CompareSession("key", commit)
+    session_id = store.add(session)
+    session.compare(_edit(commit, seed + 1))
+    store.update(session_id)
+    return session_id, session
+
+def test_store_is_bounded_by_cells():
+    assert _stored_session(SessionStore(), 1)[1].cell_count() == 960
+    store = SessionStore(max_cells=2000)
+    first, _ = _stored_session(store, 1)
+    second, _ = _stored_session(store, 2)
+    store.get(first)  # Most recently used now
+    third, _ = _stored_session(store, 3)
+    assert store.get(first) is not None and store.get(third) is not None and store.get(second) is None
+    small = SessionStore(max_cells=500)
+    huge, _ = _stored_session(small, 4)  # Bigger than the whole budget: not kept
+    assert small.get(huge) is None and len(small) == 0
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(idle_seconds=0.05)
+    session_id, session = _stored_session(store, 1)
+    assert store.get(session_id) is session
+    time.sleep(0.1)
+    assert store.get(session_id) is None and len(store) == 0
+
+def test_store_evicts_safely_across_threads():
+    store = SessionStore(max_sessions=2)
+    errors = []
+
+    def add_many():
+        try:
+            for _ in range(200):
+                store.add(CompareSession("key", {}))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors and len(store) == 2
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
@@ -0,0 +1,124 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import zipfile
+
+from benchmarks.workbook_gen import write_workbook
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.excel_parser import ExcelParser
+from excel_diff.metrics import RequestMetrics
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_files")
+
+SHEETS = {
+    "Summary": [["name", "total"], ["alpha", 1], ["beta", 2]],
+    "Data": [["id", "value"], [1, 10], [2, 20], [3, 30]],
+}
+
+class _Spy:
+    """Counts calls to a parser method while passing them through."""
+    def __init__(self, parser, method):
+        self.calls = []
+        self._wrapped = getattr(parser, method)
+        setattr(parser, method, self)
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        return self._wrapped(*args)
+
+def _parse(path, method):
+    """Parses path with a spy on one of its parser methods; must be set before parse() binds it."""
+    parser = ExcelParser(path)
+    spy = _Spy(parser, method)
+    return parser, parser.parse(), spy
+
+def _compare(path_a, path_b, method):
+    parser_a, data_a, spy_a = _parse(path_a, method)
+    parser_b, data_b, spy_b = _parse(path_b, method)
+    metrics = RequestMetrics()
+    try:
+        result = DiffEngine(data_a, data_b, metrics=metrics).compare()
+    finally:
+        parser_a.close()
+        parser_b.close()
+    return result, metrics, spy_a.calls + spy_b.calls
+
+def _with_member(source, target, member, edit):
+    """Copies an .xlsx with one zip member rewritten by edit(bytes) -> bytes."""
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            zout.writestr(info, edit(data) if info.filename == member else data)
+
+def _changed(sheet):
+    return [cell for row in sheet["data"]["rows"] for cell in row["cells"] if cell["status"] != "equal"]
+
+def test_identical_xlsx_is_never_loaded():
+    with tempfile.TemporaryDirectory() as work_dir:
+        copy = os.path.join(work_dir, "copy.xlsx")
+        shutil.copyfile(os.path.join(TEST_FILES, "test1_excel.xlsx"), copy)
+        result, metrics, loads = _compare(os.path.join(TEST_FILES, "test1_excel.xlsx"), copy, "_load_sheet")
+    assert loads == []
+    assert all(sheet.get("unchanged") for sheet in result)
+    assert metrics.counters["sheets_skipped"] == len(result) == 4
+
+def test_only_the_changed_sheet_is_loaded():
+    with tempfile.TemporaryDirectory() as work_dir:
+        path_a, path_b = os.path.join(work_dir, "a.xlsx"), os.path.join(work_dir, "b.xlsx")
+        edited = dict(SHEETS, Data=[row[:] for row in SHEETS["Data"]])
+        edited["Data"][2][1] = 21  # A number, so sharedStrings.xml stays byte-identical
+        write_workbook(path_a, SHEETS)
+        write_workbook(path_b, edited)
+        result, metrics, loads = _compare(path_a, path_b, "_load_sheet")
+    summary, data = result
+    assert summary.get("unchanged") and summary["data"]["rows"] == []
+    assert not data.get("unchanged") and [(c["a"], c["b"]) for c in _changed(data)] == [("20", "21")]
+    assert sorted(loads) == [("Data",), ("Data",)]
+    assert metrics.counters["sheets_skipped"] == 1
+
+def test_shared_strings_change_is_not_skipped():
+    # The sheet XML only holds indexes into sharedStrings.xml: identical sheet parts are not enough
+    with tempfile.TemporaryDirectory() as work_dir:
+        path_a, path_b = os.path.join(work_dir, "a.xlsx"), os.path.join(work_dir, "b.xlsx")
+        write_workbook(path_a, SHEETS)
+        _with_member(path_a, path_b, "xl/sharedStrings.xml", lambda xml: xml.replace(b">beta<", b">gamma<"))
+        with zipfile.ZipFile(path_a) as za, zipfile.ZipFile(path_b) as zb:
+            assert za.read("xl/worksheets/sheet1.xml") == zb.read("xl/worksheets/sheet1.xml")
+        result, metrics, loads = _compare(path_a, path_b, "_load_sheet")
+    assert not any(sheet.get("unchanged") for sheet in result)
+    assert [(c["a"], c["b"]) for c in _changed(result[0])] == [("beta", "gamma")]
+    assert len(loads) == 4
+    assert metrics.counters.get("sheets_skipped", 0) == 0
+
+def test_identical_xls_is_never_loaded():
+    if importlib.util.find_spec("xlwt") is None:
+        return  # .xls files are generated with xlwt, a benchmark-only dependency
+    with tempfile.TemporaryDirectory() as work_dir:
+        path_a, path_b = os.path.join(work_dir, "a.xls"), os.path.join(work_dir, "b.xls")
+        write_workbook(path_a, SHEETS)
+        shutil.copyfile(path_a, path_b)
+        result, metrics, loads = _compare(path_a, path_b, "_load_xls_sheet")
+    assert loads == []
+    assert all(sheet.get("unchanged") for sheet in result)
+    assert metrics.counters["sheets_skipped"] == 2
+
+def test_xls_of_different_sizes_skips_the_crc():
+    if importlib.util.find_spec("xlwt") is None:
+        return  # .xls files are generated with xlwt, a benchmark-only dependency
+    with tempfile.TemporaryDirectory() as work_dir:
+        path_a, path_b = os.path.join(work_dir, "a.xls"), os.path.join(work_dir, "b.xls")
+        longer = dict(SHEETS, Data=SHEETS["Data"] + [[n, n * 10] for n in range(4, 400)])
+        write_workbook(path_a, SHEETS)
+        write_workbook(path_b, longer)
+        assert os.path.getsize(path_a) != os.path.getsize(path_b)
+        result, metrics, crcs = _compare(path_a, path_b, "_file_fingerprint")
+    assert crcs == []
+    assert not any(sheet.get("unchanged") for sheet in result)
+    assert len(result[1]["data"]["rows"]) == 400
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+
+from excel_diff.uploads import ChunkedUploadStore, UploadError
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+class _BrokenStream(io.RawIOBase):
+    """Delivers some bytes, then fails like a dropped connection."""
+    def __init__(self, data):
+        self._data = data
+
+    def read(self, size=-1):
+        if self._data:
+            data, self._data = self._data, b""
+            return data
+        raise ConnectionError("client went away")
+
+@contextmanager
+def _store():
+    with tempfile.TemporaryDirectory(prefix="uploads_test_") as folder:
+        yield ChunkedUploadStore(folder, 1024 * 1024)
+
+def _error(fn, *args):
+    try:
+        fn(*args)
+    except UploadError as e:
+        return e
+    raise AssertionError("UploadError not raised")
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+def test_upload_in_chunks_and_claim():
+    with _store() as store:
+        upload_id = store.create("book.xlsx", len(DATA), _sha(DATA))["upload_id"]
+        for offset in range(0, len(DATA), 4096):
+            chunk = DATA[offset:offset + 4096]
+            state = store.write_chunk(upload_id, offset, io.BytesIO(chunk), _sha(chunk))
+            assert state["offset"] == offset + len(chunk)
+        assert state["complete"]
+        target = os.path.join(store.folder, "claimed.xlsx")
+        assert store.claim(upload_id, target)["filename"] == "book.xlsx"
+        with open(target, "rb") as f:
+            assert f.read() == DATA
+        assert _error(store.claim, upload_id, target).status == 404  # Claimed once only
+
+def test_wrong_offset_reports_resume_point():
+    with _store() as store:
+        upload_id = store.create("book.xlsx", len(DATA))["upload_id"]
+        store.write_chunk(upload_id, 0, io.BytesIO(DATA[:100]))
+        error = _error(store.write_chunk, upload_id, 50, io.BytesIO(DATA[50:150]))
+        assert (error.status, error.offset) == (409, 100)
+
+def test_failed_chunks_are_truncated():
+    with _store() as store:
+        upload_id = store.create("book.xlsx", len(DATA))["upload_id"]
+        store.write_chunk(upload_id, 0, io.BytesIO(DATA[:100]))
+        error = _error(store.write_chunk, upload_id, 100, io.BytesIO(DATA[100:200]), _sha(b"other"))
+        assert (error.status, error.offset) == (422, 100)
+        assert store.status(upload_id)["offset"] == 100
+        try:
+            store.write_chunk(upload_id, 100, _BrokenStream(DATA[100:300]))
+        except ConnectionError:
+            pass
+        assert store.status(upload_id)["offset"] == 100  # The partial chunk is dropped, resend from 100
+        error = _error(store.write_chunk, upload_id, 100, io.BytesIO(DATA[100:] + b"extra"))
+        assert (error.status, store.status(upload_id)["offset"]) == (400, 100)
+
+def test_whole_file_checksum_restarts_upload():
+    with _store() as store:
+        upload_id = store.create("book.xlsx", len(DATA), _sha(DATA))["upload_id"]
+        store.write_chunk(upload_id, 0, io.BytesIO(DATA[:-1]))
+        error = _error(store.write_chunk, upload_id, len(DATA) - 1, io.BytesIO(b"?"))
+        assert (error.status, error.offset, store.status(upload_id)["offset"]) == (422, 0, 0)
+        assert _error(store.claim, upload_id, os.path.join(store.folder, "x")).status == 409
+
+def test_rejected_uploads():
+    with _store() as store:
+        assert _error(store.create, "book.xlsx", 2 * 1024 * 1024).status == 413
+        assert _error(store.create, "book.xlsx", 0).status == 400
+        assert _error(store.status, "../../etc/passwd").status == 404
+        upload_id = store.create("book.xlsx", len(DATA))["upload_id"]
+        store.discard(upload_id)
+        assert _error(store.status, upload_id).status == 404
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")
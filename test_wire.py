@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+import shutil
+import subprocess
+
+from excel_diff.diff_engine import DiffEngine
+from excel_diff.excel_parser import ExcelParser
+from excel_diff.wire import ENCODING, CompactEncoder, decode_diff, gzip_stream
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+TEST_FILES = os.path.join(PROJECT_ROOT, "test_files")
+
+def _sample_diff():
+    """A real workbook diff plus a sheet exercising every op: runs, pairs, offsets and trailing blanks."""
+    diff = DiffEngine(ExcelParser(os.path.join(TEST_FILES, "test1_excel.xlsx")).parse(),
+                      ExcelParser(os.path.join(TEST_FILES, "test2_excel.xlsx")).parse()).compare()
+    rows_a = [["", "", "x", "y", "1 ", "", ""], ["same", "old", "", "gone", "", "", ""], []]
+    rows_b = [["", "", "x", "y", "1", "", ""], ["same", "new", "added", "", "", "", ""], ["", "", "", "", "", "", "tail"]]
+    diff.append({"name_a": "Ranged", "name_b": "Ranged", "is_match": True,
+                 "data": DiffEngine({}, {})._compare_sheet(rows_a, rows_b, row_offset=9, col_offset=2)})
+    diff.append({"name_a": "Same", "name_b": "Same", "is_match": True, "unchanged": True,
+                 "data": {"max_cols": 0, "col_offset": 0, "rows": []}})
+    return diff
+
+def _encode(diff):
+    encoder = CompactEncoder()
+    return [encoder.encode_sheet(sheet) for sheet in diff]
+
+def _wire(obj):
+    return json.loads(json.dumps(obj))  # What the client actually receives
+
+def test_round_trip():
+    diff = _sample_diff()
+    assert decode_diff(_wire(_encode(diff))) == _wire(diff)
+
+def test_strings_are_sent_once():
+    encoded = _encode(_sample_diff())
+    strings = [s for sheet in encoded for s in sheet["strings"]]
+    assert len(strings) == len(set(strings))
+    assert len(json.dumps(encoded)) < len(json.dumps(_sample_diff())) / 2
+
+def test_js_decoder_matches_python():
+    node = shutil.which("node")
+    if node is None:
+        return  # The JS mirror in the result page is only checked where Node.js is installed
+    with open(os.path.join(PROJECT_ROOT, "templates", "excel_diff_result.html"), encoding="utf-8") as f:
+        page = f.read()
+    start = page.index("function decodeCompactDiff(")
+    source = page[start:page.index("\n    }\n", start) + 6]
+    script = source + ("\nconst data = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+                       "\nprocess.stdout.write(JSON.stringify(decodeCompactDiff(data)));")
+    payload = {"diff": _encode(_sample_diff()), "total_diffs": 3, "encoding": ENCODING}
+    output = subprocess.run([node, "-e", script], input=json.dumps(payload), capture_output=True,
+                            text=True, check=True).stdout
+    assert json.loads(output) == {"diff": _wire(_sample_diff()), "total_diffs": 3}
+
+def test_gzip_stream():
+    chunks = [json.dumps(sheet) for sheet in _encode(_sample_diff())] * 50
+    assert gzip.decompress(b"".join(gzip_stream(iter(chunks)))).decode("utf-8") == "".join(chunks)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ✅")